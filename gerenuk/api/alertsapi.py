@@ -23,6 +23,7 @@
 import configparser
 import datetime
 import gerenuk
+import gerenuk.database
 
 
 
@@ -36,25 +37,21 @@ class AlertsAPI():
         Initialize the LibvirtMonitor object
 
         :raise: (gerenuk.DependencyError) When a required dependency is missing
-        :raise: (gerenuk.MonitoringError) When an internal error occurs
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
         """
-        # Dependencies
-        try:
-            import mysql.connector
-        except Exception as e:
-            raise gerenuk.DependencyError(e)
-
         # Config
         self.config = config
 
-        # MySQL
-        self.database = mysql.connector.connect(
-            host=self.config.get("database", "db_host"),
-            user=self.config.get("database", "db_user"),
-            password=self.config.get("database", "db_pass"),
-            database=self.config.get("database", "db_name")
-        )
-        self.db_cursor = self.database.cursor()
+        # MySQL (connection checked out from the shared pool)
+        self.database = gerenuk.database.Database(self.config)
+
+
+
+    def close(self):
+        """
+        Release the database connection to the shared pool.
+        """
+        self.database.close()
 
 
 
@@ -66,10 +63,8 @@ class AlertsAPI():
         :return: (list) list of alerts dicts
                  
         """
-        sql = "SELECT id, uuid, project, severity, status, message, timestamp FROM user_alerts WHERE project='%s' AND status='1';"
-
-        self.db_cursor.execute(sql % (project_id,))
-        rows = self.db_cursor.fetchall()
+        sql = "SELECT id, uuid, project, severity, status, message, timestamp FROM user_alerts WHERE project=%s AND status=1;"
+        rows = self.database.fetchall(sql, (project_id,))
 
         alerts = list()
         
@@ -97,10 +92,8 @@ class AlertsAPI():
         :return: (list) list of alerts dicts
                  
         """
-        sql = "SELECT id, uuid, project, severity, status, message, timestamp FROM user_alerts WHERE project='%s' AND status='0';"
-
-        self.db_cursor.execute(sql % (project_id,))
-        rows = self.db_cursor.fetchall()
+        sql = "SELECT id, uuid, project, severity, status, message, timestamp FROM user_alerts WHERE project=%s AND status=0;"
+        rows = self.database.fetchall(sql, (project_id,))
 
         alerts = list()
         
@@ -126,9 +119,8 @@ class AlertsAPI():
 
         :param alerts: (list) the alerts IDs
         """
-        for alert_id in alerts:
-            sql = "UPDATE user_alerts SET status='0' WHERE id='%d';"
-            self.db_cursor.execute(sql % (alert_id,))
+        sql = "UPDATE user_alerts SET status=0 WHERE id=%s;"
+        self.database.executemany(sql, [(alert_id,) for alert_id in alerts])
 
         self.database.commit()
 
@@ -139,8 +131,8 @@ class AlertsAPI():
 
         :param alerts: (list) the alerts IDs
         """
-        for alert_id in alerts:
-            sql = "UPDATE user_alerts SET status='1' WHERE id='%d';"
-            self.db_cursor.execute(sql % (alert_id,))
+        # An alert can't be unread twice (see user_alerts.unread_key)
+        sql = "UPDATE IGNORE user_alerts SET status=1 WHERE id=%s;"
+        self.database.executemany(sql, [(alert_id,) for alert_id in alerts])
 
         self.database.commit()
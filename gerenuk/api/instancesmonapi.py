@@ -23,6 +23,12 @@
 import configparser
 import datetime
 import gerenuk
+import gerenuk.database
+import gerenuk.series
+
+
+# The instances_monitoring fields read by the API (series are summarized by libvirt monitors)
+MONITORING_FIELDS = ['uuid', 'hypervisor', 'vcores', 'vram', 'last_update'] + gerenuk.series.AGGREGATE_COLUMNS
 
 
 
@@ -36,25 +42,21 @@ class InstancesMonitorAPI():
         Initialize the LibvirtMonitor object
 
         :raise: (gerenuk.DependencyError) When a required dependency is missing
-        :raise: (gerenuk.MonitoringError) When an internal error occurs
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
         """
-        # Dependencies
-        try:
-            import mysql.connector
-        except Exception as e:
-            raise gerenuk.DependencyError(e)
-
         # Config
         self.config = config
 
-        # MySQL
-        self.database = mysql.connector.connect(
-            host=self.config.get("database", "db_host"),
-            user=self.config.get("database", "db_user"),
-            password=self.config.get("database", "db_pass"),
-            database=self.config.get("database", "db_name")
-        )
-        self.db_cursor = self.database.cursor()
+        # MySQL (connection checked out from the shared pool)
+        self.database = gerenuk.database.Database(self.config)
+
+
+
+    def close(self):
+        """
+        Release the database connection to the shared pool.
+        """
+        self.database.close()
 
 
 
@@ -68,81 +70,62 @@ class InstancesMonitorAPI():
                  Each monitoring dict associates metric as key and usage percentil as values (or -1 if data not available).
                  
         """
-        sql = "SELECT * FROM instances_monitoring"
-        operator = " WHERE"
-        for uuid in uuids:
-            sql += "%s uuid='%s'" % (operator, uuid)
-            operator = " OR"
-
-        monitoring = dict()
-
-        if len(uuids) > 0:
-            self.db_cursor.execute(sql)
-            rows = self.db_cursor.fetchall()
-
-            for row in rows:
-                (uuid, hypervisor, vcores, vram) = row[0:4]
-                (hourly_vcpu_usage, daily_vcpu_usage, weekly_vcpu_usage) = row[4:7]
-                (hourly_cpu_usage, daily_cpu_usage, weekly_cpu_usage) = row[7:10]
-                (hourly_mem_usage, daily_mem_usage, weekly_mem_usage) = row[10:13]
-                (deleted, last_update) = row[13:]
-
-                if uuid in monitoring:
-                    continue
-
-                if deleted == 1:
-                    continue
-                
-                info = {"hypervisor": hypervisor, "vcores": vcores, "vmem": vram, "updated": last_update}
-                monitoring[uuid] = {"info": info, "vcpu": tuple(), "cpu": tuple(), "mem": tuple()}
-
-                if len(hourly_vcpu_usage) > 0:
-                    hourly_vcpu_average = sum(float(n) for n in hourly_vcpu_usage.split(',') if len(n) > 0) / float(len(hourly_vcpu_usage.split(',')))
-                else:
-                    hourly_vcpu_average = -1.
-
-                if len(hourly_cpu_usage) > 0:
-                    hourly_cpu_average = sum(float(n) for n in hourly_cpu_usage.split(',') if len(n) > 0) / float(len(hourly_cpu_usage.split(',')))
-                else:
-                    hourly_cpu_average = -1.
-
-                if len(hourly_mem_usage) > 0:
-                    hourly_mem_average = sum(float(n) for n in hourly_mem_usage.split(',') if len(n) > 0) / float(len(hourly_mem_usage.split(',')))
-                else:
-                    hourly_mem_average = -1.
-
-                if len(daily_vcpu_usage) > 0:
-                    daily_vcpu_average = sum(float(n) for n in daily_vcpu_usage.split(',') if len(n) > 0) / float(len(daily_vcpu_usage.split(',')))
-                else:
-                    daily_vcpu_average = -1.
-
-                if len(daily_cpu_usage) > 0:
-                    daily_cpu_average = sum(float(n) for n in daily_cpu_usage.split(',') if len(n) > 0) / float(len(daily_cpu_usage.split(',')))
-                else:
-                    daily_cpu_average = -1.
-
-                if len(daily_mem_usage) > 0:
-                    daily_mem_average = sum(float(n) for n in daily_mem_usage.split(',') if len(n) > 0) / float(len(daily_mem_usage.split(',')))
-                else:
-                    daily_mem_average = -1.
-
-                if len(weekly_vcpu_usage) > 0:
-                    weekly_vcpu_average = sum(float(n) for n in weekly_vcpu_usage.split(',') if len(n) > 0) / float(len(weekly_vcpu_usage.split(',')))
-                else:
-                    weekly_vcpu_average = -1.
-
-                if len(weekly_cpu_usage) > 0:
-                    weekly_cpu_average = sum(float(n) for n in weekly_cpu_usage.split(',') if len(n) > 0) / float(len(weekly_cpu_usage.split(',')))
-                else:
-                    weekly_cpu_average = -1.
-
-                if len(weekly_mem_usage) > 0:
-                    weekly_mem_average = sum(float(n) for n in weekly_mem_usage.split(',') if len(n) > 0) / float(len(weekly_mem_usage.split(',')))
-                else:
-                    weekly_mem_average = -1.
-
-                monitoring[uuid]["vcpu"] = {'hourly': round(hourly_vcpu_average, 2), 'daily': round(daily_vcpu_average, 2), 'weekly': round(weekly_vcpu_average, 2)}
-                monitoring[uuid]["cpu"] = {'hourly': round(hourly_cpu_average, 2), 'daily': round(daily_cpu_average, 2), 'weekly': round(weekly_cpu_average, 2)}
-                monitoring[uuid]["mem"] = {'hourly': round(hourly_mem_average, 2), 'daily': round(daily_mem_average, 2), 'weekly': round(weekly_mem_average, 2)}
+        return dict(self.iter_instances_monitoring(uuids))
+
+
+
+    def iter_instances_monitoring(self, uuids):
+        """
+        Stream monitoring data for many instances, sorted by uuid.
+        The uuids are queried by chunks of database.uuids_per_query, so statements size stays bounded.
+
+        :param uuids: (list) the list of instances uuid we want to get monitoring data
+        :return: (generator) the (uuid, monitoring dict) tuples of requested instances, if available
+        """
+        uuids = sorted(set(uuids))
+        chunk_size = self.config.snapshot().database.uuids_per_query
+
+        for i in range(0, len(uuids), chunk_size):
+            chunk = uuids[i:i+chunk_size]
+
+            # Pad the last chunk of long lists, so all chunks use the same prepared statement
+            if i > 0:
+                chunk += [chunk[-1]] * (chunk_size - len(chunk))
+
+            sql =  "SELECT " + ", ".join(MONITORING_FIELDS) + " FROM instances_monitoring "
+            sql += "WHERE uuid IN (" + gerenuk.database.placeholders(chunk) + ") AND deleted=0 ORDER BY uuid;"
+            for row in self.database.iterate(sql, chunk):
+                yield (row[0], self.build_monitoring(row))
+
+
+
+    def build_monitoring(self, row):
+        """
+        Build the monitoring dict of an instance from its precomputed aggregates.
+
+        :param row: (tuple) the instances_monitoring row of the instance (see MONITORING_FIELDS)
+        :return: (dict) the instance monitoring dict.
+                 The "aggregates" dict gives the average, min, max and 95th percentile of each series (None if not available).
+        """
+        (uuid, hypervisor, vcores, vram, last_update) = row[0:5]
+        aggregates = dict(zip(gerenuk.series.AGGREGATE_COLUMNS, row[5:]))
+
+        info = {"hypervisor": hypervisor, "vcores": vcores, "vmem": vram, "updated": last_update}
+        monitoring = {"info": info, "vcpu": dict(), "cpu": dict(), "mem": dict(), "aggregates": dict()}
+
+        for metric in ["vcpu", "cpu", "mem"]:
+            monitoring["aggregates"][metric] = dict()
+
+            for period in ["hourly", "daily", "weekly"]:
+                summary = dict()
+                for aggregate in gerenuk.series.SERIES_AGGREGATES:
+                    summary[aggregate] = aggregates["%s_%s_%s" % (period, metric, aggregate)]
+                monitoring["aggregates"][metric][period] = summary
+
+                average = -1.
+                if summary["avg"] is not None:
+                    average = summary["avg"]
+
+                monitoring[metric][period] = round(average, 2)
 
         return monitoring
@@ -24,6 +24,8 @@
 from . import BASE_PATH
 from .exceptions import ConfigError
 import configparser
+import collections
+import threading
 import logging
 import ast
 import sys
@@ -40,8 +42,20 @@ class Config():
         Initialize the Config object.
         """
         self.config = configparser.ConfigParser()
+
+        # Converted options (invalidated on load)
+        self.cache = dict()
+        self.cache_lock = threading.Lock()
+        self.frozen = None
+
         self.load(BASE_PATH + "/defaults.conf")
 
+        # Options types, inferred from default values
+        self.types = dict()
+        for section in self.config.sections():
+            for (option, value) in self.config.items(section):
+                self.types[(section, option)] = infer_type(value)
+
         # Constants
         self.LOG_LEVEL_MAPPING = {
             "CRITICAL": logging.CRITICAL,
@@ -63,6 +77,10 @@ class Config():
 
         self.config.read(config_file)
 
+        with self.cache_lock:
+            self.cache = dict()
+            self.frozen = None
+
 
     def get(self, section, option):
         """
@@ -75,6 +93,28 @@ class Config():
         return self.config.get(section, option)
 
 
+    def get_converted(self, kind, section, option, converter):
+        """
+        Get an option value converted once for all.
+
+        :param kind: (str) The conversion kind
+        :param section: (str) The section to looking in
+        :param option: (str) The option to looking for
+        :param converter: (function) The conversion function (section, option) -> value
+        :return: (object) The converted configuration item if exists
+        """
+        key = (kind, section, option)
+        cache = self.cache
+
+        if key in cache:
+            return cache[key]
+
+        value = converter(section, option)
+        with self.cache_lock:
+            cache[key] = value
+        return value
+
+
     def get_int(self, section, option):
         """
         Get an integer option value for the named section.
@@ -83,18 +123,19 @@ class Config():
         :param option: (str) The option to looking for
         :return: (int) The configuration item if exists
         """
-        return self.config.getint(section, option)
+        return self.get_converted("int", section, option, self.config.getint)
 
     
     def get_list(self, section, option):
         """
         Get an integer option value for the named section.
+        The same list is given on each call, so it must not be modified.
 
         :param section: (str) The section to looking in
         :param option: (str) The option to looking for
         :return: (list) The configuration item if exists
         """
-        return ast.literal_eval(self.config.get(section, option))
+        return self.get_converted("list", section, option, lambda section, option: ast.literal_eval(self.config.get(section, option)))
 
 
     def get_bool(self, section, option):
@@ -105,4 +146,63 @@ class Config():
         :param option: (str) The option to looking for
         :return: (bool) The configuration item if exists
         """
-        return self.config.getboolean(section, option)
+        return self.get_converted("bool", section, option, self.config.getboolean)
+
+
+    def snapshot(self):
+        """
+        Get a frozen and typed snapshot of the configuration.
+        Options are converted once, according to the type of their default value,
+        and read as attributes (e.g. snapshot.libvirt.monitoring_frequency).
+        Lists become tuples. The snapshot is rebuilt after each load.
+
+        :return: (namedtuple) The configuration snapshot, one namedtuple per section
+        :raise: (ConfigError) When an option can't be converted
+        """
+        frozen = self.frozen
+        if frozen is not None:
+            return frozen
+
+        getters = {
+            "int": self.get_int,
+            "bool": self.get_bool,
+            "list": lambda section, option: tuple(self.get_list(section, option)),
+            "str": self.get,
+        }
+
+        sections = dict()
+        for section in self.config.sections():
+            options = self.config.options(section)
+            try:
+                values = [getters[self.types.get((section, option), "str")](section, option) for option in options]
+            except (ValueError, SyntaxError) as e:
+                raise ConfigError("invalid value in section %s: %s" % (section, str(e)))
+            sections[section] = collections.namedtuple(section, options, rename=True)(*values)
+
+        frozen = collections.namedtuple("ConfigSnapshot", sections.keys(), rename=True)(*sections.values())
+        with self.cache_lock:
+            self.frozen = frozen
+        return frozen
+
+
+
+def infer_type(value):
+    """
+    Infer the type of an option from its value.
+
+    :param value: (str) The option value
+    :return: (str) The option type (int, bool, list or str)
+    """
+    if value.lower() in ("true", "false", "yes", "no", "on", "off"):
+        return "bool"
+
+    try:
+        int(value)
+        return "int"
+    except ValueError:
+        pass
+
+    if value.startswith("["):
+        return "list"
+
+    return "str"
@@ -0,0 +1,571 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sat Oct 17 11:04:52 AM CEST 2026
+
+from .exceptions import DependencyError, ConnectivityError
+import collections
+import threading
+import itertools
+import logging
+import time
+import os
+import re
+
+
+# The maximum number of prepared statements kept per connection
+MAX_PREPARED_STATEMENTS = 64
+
+# Multi-rows INSERT statements (INSERT ... VALUES (...) [ON DUPLICATE KEY UPDATE ...])
+RE_INSERT_VALUES = re.compile(r"^(\s*INSERT\s.*?\sVALUES\s*)(\([^()]*\))(.*)$", re.IGNORECASE | re.DOTALL)
+
+# The connection pools of current process, indexed by connection parameters
+POOLS = dict()
+POOLS_LOCK = threading.Lock()
+
+
+
+def get_pool(config):
+    """
+    Get the connection pool matching a configuration.
+    Pools are shared by all Database objects of the process.
+
+    :param config: (gerenuk.Config) The configuration object
+    :return: (gerenuk.database.ConnectionPool) The connection pool
+    """
+    key = (
+        config.get("database", "db_host"),
+        config.get("database", "db_user"),
+        config.get("database", "db_name")
+    )
+
+    with POOLS_LOCK:
+        if not key in POOLS:
+            POOLS[key] = ConnectionPool(config)
+        return POOLS[key]
+
+
+
+def get_pools_metrics():
+    """
+    Get the metrics of all connection pools of current process.
+
+    :return: (dict) The pools metrics indexed by "user@host/database"
+    """
+    with POOLS_LOCK:
+        pools = dict(POOLS)
+
+    metrics = dict()
+    for (host, user, name) in pools:
+        metrics["%s@%s/%s" % (user, host, name)] = pools[(host, user, name)].get_metrics()
+
+    return metrics
+
+
+
+class ConnectionPool():
+    """
+    This class is used to share database connections.
+    Idle connections are checked before being reused and new connections are opened with an exponential backoff.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize the ConnectionPool object.
+
+        :param config: (gerenuk.Config) The configuration object
+        """
+        self.config = config
+        self.log = logging.getLogger("gerenuk-database")
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.idle = list()
+        self.metrics = {
+            "created": 0,
+            "reused": 0,
+            "released": 0,
+            "discarded": 0,
+            "failed_pings": 0,
+            "retries": 0,
+            "failures": 0,
+            "in_use": 0
+        }
+
+
+
+    def acquire(self):
+        """
+        Check out a connection from the pool.
+        An idle connection is pinged before being reused, otherwise a new connection is opened.
+
+        :return: (tuple) The connection and its prepared statements cache
+        :raise: (gerenuk.DependencyError) When a required dependency is missing
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
+        """
+        self.check_pid()
+
+        while True:
+            with self.lock:
+                if len(self.idle) == 0:
+                    break
+                (connection, statements) = self.idle.pop()
+
+            if self.is_alive(connection):
+                with self.lock:
+                    self.metrics["reused"] += 1
+                    self.metrics["in_use"] += 1
+                return (connection, statements)
+
+            with self.lock:
+                self.metrics["failed_pings"] += 1
+            self.close_connection(connection, statements)
+
+        connection = self.connect()
+        with self.lock:
+            self.metrics["in_use"] += 1
+        return (connection, collections.OrderedDict())
+
+
+
+    def release(self, connection, statements):
+        """
+        Check in a connection.
+        The pending transaction is rolled back and the connection is kept if the pool is not full.
+
+        :param connection: (mysql.connector.MySQLConnection) The connection to release
+        :param statements: (collections.OrderedDict) The prepared statements cache of the connection
+        """
+        with self.lock:
+            self.metrics["in_use"] -= 1
+
+        if self.check_pid():
+            # Connection inherited from parent process
+            return
+
+        try:
+            connection.rollback()
+        except Exception:
+            self.discard(connection, statements)
+            return
+
+        with self.lock:
+            if len(self.idle) < self.config.snapshot().database.pool_size:
+                self.idle.append((connection, statements))
+                self.metrics["released"] += 1
+                return
+
+        self.close_connection(connection, statements)
+
+
+
+    def discard(self, connection, statements):
+        """
+        Close a checked out connection without putting it back in the pool.
+
+        :param connection: (mysql.connector.MySQLConnection) The connection to discard
+        :param statements: (collections.OrderedDict) The prepared statements cache of the connection
+        """
+        with self.lock:
+            self.metrics["in_use"] -= 1
+            self.metrics["discarded"] += 1
+
+        self.close_connection(connection, statements)
+
+
+
+    def connect(self):
+        """
+        Open a new connection.
+        Failed attempts are retried max_conn_retries times, waiting wait_before_conn_retry * 2^n seconds between them.
+
+        :return: (mysql.connector.MySQLConnection) The new connection
+        :raise: (gerenuk.DependencyError) When a required dependency is missing
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
+        """
+        try:
+            import mysql.connector
+        except Exception as e:
+            raise DependencyError(e)
+
+        retries = 0
+        while True:
+            try:
+                connection = mysql.connector.connect(
+                    host=self.config.get("database", "db_host"),
+                    user=self.config.get("database", "db_user"),
+                    password=self.config.get("database", "db_pass"),
+                    database=self.config.get("database", "db_name"),
+                    connection_timeout=self.config.get_int("database", "db_timeout")
+                )
+                with self.lock:
+                    self.metrics["created"] += 1
+                return connection
+
+            except mysql.connector.Error as e:
+                if retries >= self.config.get_int("database", "max_conn_retries"):
+                    with self.lock:
+                        self.metrics["failures"] += 1
+                    raise ConnectivityError(e)
+
+                retries += 1
+                wait = self.backoff(retries)
+                with self.lock:
+                    self.metrics["retries"] += 1
+                self.log.warning("Unable to connect to database, wait %d seconds before attempt #%d..." % (wait, retries))
+                time.sleep(wait)
+
+
+
+    def backoff(self, retries):
+        """
+        Compute the time to wait before a connection retry.
+
+        :param retries: (int) The retry number (starting from 1)
+        :return: (int) The time to wait (in seconds)
+        """
+        return self.config.get_int("database", "wait_before_conn_retry") * 2**(retries - 1)
+
+
+
+    def is_alive(self, connection):
+        """
+        Check if a connection is still alive.
+
+        :param connection: (mysql.connector.MySQLConnection) The connection to check
+        :return: (bool) True if the server answered
+        """
+        try:
+            connection.ping(reconnect=False)
+        except Exception:
+            return False
+        return True
+
+
+
+    def check_pid(self):
+        """
+        Forget connections inherited from a parent process (after a fork).
+
+        :return: (bool) True if the pool has been reset
+        """
+        if self.pid == os.getpid():
+            return False
+
+        with self.lock:
+            # Inherited sockets are still used by the parent process: don't close them
+            self.idle = list()
+            self.pid = os.getpid()
+            self.metrics["in_use"] = 0
+        return True
+
+
+
+    def close_connection(self, connection, statements):
+        """
+        Close a connection and its prepared statements.
+
+        :param connection: (mysql.connector.MySQLConnection) The connection to close
+        :param statements: (collections.OrderedDict) The prepared statements cache of the connection
+        """
+        for cursor in statements.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+
+    def get_metrics(self):
+        """
+        Get the pool metrics.
+
+        :return: (dict) The pool metrics
+        """
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics["idle"] = len(self.idle)
+        return metrics
+
+
+
+class Database():
+    """
+    This class is used to access the gerenuk database.
+    Connections are checked out from a shared pool, and all statements are server-side prepared statements with bound parameters.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize the Database object.
+
+        :param config: (gerenuk.Config) The configuration object
+        :raise: (gerenuk.DependencyError) When a required dependency is missing
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
+        """
+        self.config = config
+        self.log = logging.getLogger("gerenuk-database")
+        self.pool = get_pool(config)
+        self.connection = None
+        self.statements = None
+        self.connect()
+
+
+
+    def __del__(self):
+        """
+        Release the connection when the object is garbage collected.
+        """
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+
+    def __enter__(self):
+        """
+        Use the Database object as a context manager.
+
+        :return: (gerenuk.database.Database) The current object
+        """
+        return self
+
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Release the connection at the end of the with block.
+        """
+        self.close()
+
+
+
+    def connect(self):
+        """
+        Check out a connection from the pool.
+
+        :raise: (gerenuk.DependencyError) When a required dependency is missing
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
+        """
+        (self.connection, self.statements) = self.pool.acquire()
+
+
+
+    def close(self):
+        """
+        Release the connection to the pool.
+        """
+        if self.connection is not None:
+            self.pool.release(self.connection, self.statements)
+            self.connection = None
+            self.statements = None
+
+
+
+    def reconnect(self):
+        """
+        Discard the current connection and check out a new one.
+
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
+        """
+        if self.connection is not None:
+            self.pool.discard(self.connection, self.statements)
+            self.connection = None
+            self.statements = None
+
+        self.connect()
+
+
+
+    def run(self, function, *args, **kwargs):
+        """
+        Run a database operation, retrying it on a fresh connection if the connection is lost.
+        The operation is retried max_conn_retries times, waiting wait_before_conn_retry * 2^n seconds between attempts.
+
+        :param function: (callable) The database operation
+        :return: The operation result
+        :raise: (gerenuk.DependencyError) When a required dependency is missing
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
+        """
+        try:
+            import mysql.connector
+        except Exception as e:
+            raise DependencyError(e)
+
+        retries = 0
+        while True:
+            try:
+                return function(*args, **kwargs)
+
+            except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError) as e:
+                if retries >= self.config.get_int("database", "max_conn_retries"):
+                    raise ConnectivityError(e)
+
+                retries += 1
+                wait = self.pool.backoff(retries)
+                self.log.warning("Connection with database lost, wait %d seconds before attempt #%d..." % (wait, retries))
+                time.sleep(wait)
+                self.reconnect()
+
+
+
+    def prepare(self, sql):
+        """
+        Get the prepared cursor of a statement.
+        Each statement is prepared once per connection.
+
+        :param sql: (str) The SQL statement, using %s placeholders
+        :return: (mysql.connector.cursor.MySQLCursorPrepared) The prepared cursor
+        """
+        if sql in self.statements:
+            self.statements.move_to_end(sql)
+            return self.statements[sql]
+
+        if len(self.statements) >= MAX_PREPARED_STATEMENTS:
+            (old_sql, old_cursor) = self.statements.popitem(last=False)
+            old_cursor.close()
+
+        cursor = self.connection.cursor(prepared=True)
+        self.statements[sql] = cursor
+        return cursor
+
+
+
+    def execute(self, sql, params=()):
+        """
+        Execute a statement.
+
+        :param sql: (str) The SQL statement, using %s placeholders
+        :param params: (tuple) The bound parameters
+        :return: (mysql.connector.cursor.MySQLCursorPrepared) The cursor used (for rowcount and lastrowid)
+        """
+        cursor = self.prepare(sql)
+        cursor.execute(sql, tuple(params))
+        return cursor
+
+
+
+    def executemany(self, sql, params_list, batch_size=None):
+        """
+        Execute a statement for each parameters tuple.
+        INSERT statements are sent as prepared multi-rows statements of batch_size rows.
+
+        :param sql: (str) The SQL statement, using %s placeholders
+        :param params_list: (list) The bound parameters tuples
+        :param batch_size: (int) The number of rows per INSERT statement (None for database.batch_size)
+        :return: (int) The number of affected rows
+        """
+        params_list = [tuple(params) for params in params_list]
+        rowcount = 0
+
+        match = RE_INSERT_VALUES.match(sql)
+        if not match:
+            for params in params_list:
+                rowcount += self.execute(sql, params).rowcount
+            return rowcount
+
+        (head, values, tail) = match.groups()
+        if batch_size is None:
+            batch_size = self.config.snapshot().database.batch_size
+
+        for i in range(0, len(params_list), batch_size):
+            batch = params_list[i:i+batch_size]
+            batch_sql = head + ", ".join([values] * len(batch)) + tail
+            rowcount += self.execute(batch_sql, itertools.chain.from_iterable(batch)).rowcount
+
+        return rowcount
+
+
+
+    def fetchall(self, sql, params=()):
+        """
+        Execute a query and fetch all rows.
+
+        :param sql: (str) The SQL query, using %s placeholders
+        :param params: (tuple) The bound parameters
+        :return: (list) The rows
+        """
+        return self.execute(sql, params).fetchall()
+
+
+
+    def iterate(self, sql, params=(), size=100):
+        """
+        Execute a query and read its rows by blocks.
+        The rows have to be consumed before the next statement is executed.
+
+        :param sql: (str) The SQL query, using %s placeholders
+        :param params: (tuple) The bound parameters
+        :param size: (int) The number of rows read at once
+        :return: (generator) The rows
+        """
+        cursor = self.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(size)
+            if len(rows) == 0:
+                break
+            yield from rows
+
+
+
+    def fetchone(self, sql, params=()):
+        """
+        Execute a query and fetch the first row.
+
+        :param sql: (str) The SQL query, using %s placeholders
+        :param params: (tuple) The bound parameters
+        :return: (tuple) The first row (or None if no row)
+        """
+        rows = self.fetchall(sql, params)
+        if len(rows) == 0:
+            return None
+        return rows[0]
+
+
+
+    def commit(self):
+        """
+        Commit the current transaction.
+        """
+        self.connection.commit()
+
+
+
+    def rollback(self):
+        """
+        Rollback the current transaction.
+        """
+        self.connection.rollback()
+
+
+
+def placeholders(values):
+    """
+    Build the placeholders list of an IN (...) clause.
+
+    :param values: (list) The values to bind
+    :return: (str) The comma-separated placeholders
+    """
+    return ", ".join(["%s"] * len(values))
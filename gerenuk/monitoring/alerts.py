@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sat Oct 17 02:11:45 PM CEST 2026
+
+ALERT_INSTANCE_ERROR = "instance_error"
+ALERT_INSTANCE_STOPPED = "instance_stopped"
+ALERT_INSTANCE_RUNNING = "instance_running"
+ALERT_USER_INSTANCES = "user_instances"
+ALERT_USER_VCPUS = "user_vcpus"
+ALERT_VOLUME_ERROR = "volume_error"
+ALERT_VOLUME_ORPHAN = "volume_orphan"
+ALERT_VOLUME_INACTIVE = "volume_inactive"
+ALERT_USER_VOLUMES = "user_volumes"
+ALERT_USER_STORAGE = "user_storage"
+ALERT_SG_DEFAULT = "sg_default"
+ALERT_SG_WORLD_OPEN = "sg_world_open"
+ALERT_SG_WIDE_OPEN = "sg_wide_open"
+ALERT_SG_RANGE_OPEN = "sg_range_open"
+
+# Security groups alerts are not addressed to a specific user
+SECURITY_GROUP_ALERTS = (ALERT_SG_DEFAULT, ALERT_SG_WORLD_OPEN, ALERT_SG_WIDE_OPEN, ALERT_SG_RANGE_OPEN)
+
+
+import datetime
+import re
+
+
+# Alert messages patterns, used to identify alerts from their message
+ALERT_PATTERNS = [
+    (ALERT_INSTANCE_ERROR, re.compile(r"^Instance (?P<resource>\S+) .*\) in error \(ERROR\) since [0-9]+ days?\.$")),
+    (ALERT_INSTANCE_STOPPED, re.compile(r"^Instance (?P<resource>\S+) .*\) stopped \(SHUTOFF\) since [0-9]+ days?\.$")),
+    (ALERT_INSTANCE_RUNNING, re.compile(r"^Instance (?P<resource>\S+) .*\) running \(ACTIVE\) since a long time \([0-9]+ days?\)\.$")),
+    (ALERT_USER_INSTANCES, re.compile(r"^Too many instances \([0-9]+\) launched by user (?P<resource>\S+)\.$")),
+    (ALERT_USER_VCPUS, re.compile(r"^Too many vCPUs \([0-9]+\) for user (?P<resource>\S+)\.$")),
+    (ALERT_VOLUME_ERROR, re.compile(r"^Volume (?P<resource>\S+)( .*\) in error \((ERROR|ERROR_DELETING)\) since [0-9]+ days?\.)?$")),
+    (ALERT_VOLUME_ORPHAN, re.compile(r"^Volume (?P<resource>\S+) created on .*\) probably orphan \(AVAILABLE\) since [0-9]+ days?\.$")),
+    (ALERT_VOLUME_INACTIVE, re.compile(r"^Volume (?P<resource>\S+) .*\) inactive \(AVAILABLE\) since [0-9]+ days?\.$")),
+    (ALERT_USER_VOLUMES, re.compile(r"^Too many volumes \([0-9]+\) created by user (?P<resource>\S+)\.$")),
+    (ALERT_USER_STORAGE, re.compile(r"^Too much storage \([0-9]+GB\) for user (?P<resource>\S+)\.$")),
+    (ALERT_SG_DEFAULT, re.compile(r"^User defined rules in default security group \(reminder: it's forbidden\)!$")),
+    (ALERT_SG_WORLD_OPEN, re.compile(r"^(?P<ports>All ports|Ports? \S+) \((?P<protocol>[^)]*)\) open all over the Internet in security group .* \((?P<sg>[^()]+)\) since [0-9]+ days?!$")),
+    (ALERT_SG_WIDE_OPEN, re.compile(r"^(?P<ports>All ports|Ports? \S+) \((?P<protocol>[^)]*)\) open to (?P<remote>\S+) in security group .* \((?P<sg>[^()]+)\) since [0-9]+ days?\.$")),
+    (ALERT_SG_RANGE_OPEN, re.compile(r"^[0-9]+ ports? in range (?P<ports>\S+) \((?P<protocol>[^)]*)\) open to (?P<remote>\S+) in security group .* \((?P<sg>[^()]+)\) since [0-9]+ days?\.$")),
+]
+
+
+
+def security_group_rule_id(sg_id, protocol, ports, remote=None):
+    """
+    Build the resource ID identifying a security group rule alert.
+
+    :param sg_id: (str) The security group ID
+    :param protocol: (str) The rule protocol
+    :param ports: (str) The rule ports ("all", "port" or "min:max")
+    :param remote: (str) The rule remote IP prefix (None for rules open to the Internet)
+    :return: (str) The resource ID
+    """
+    resource_id = "%s/%s/%s" % (sg_id, protocol, ports)
+    if remote:
+        resource_id += "/" + remote
+    return resource_id
+
+
+
+def parse_alert_key(message, user_id):
+    """
+    Identify an alert from its message.
+
+    :param message: (str) The alert message
+    :param user_id: (str) The user concerned by the alert
+    :return: (tuple) The alert key (kind, resource_id, user_id), or None if the message is unknown
+    """
+    for (kind, pattern) in ALERT_PATTERNS:
+        match = pattern.match(message)
+        if not match:
+            continue
+
+        if kind == ALERT_SG_DEFAULT:
+            return (kind, "default", None)
+
+        if kind in SECURITY_GROUP_ALERTS:
+            ports = match.group("ports")
+            if ports == "All ports":
+                ports = "all"
+            elif ports.startswith("Port"):
+                ports = ports.split(" ", 1)[1]
+
+            remote = None
+            if kind != ALERT_SG_WORLD_OPEN:
+                remote = match.group("remote")
+
+            return (kind, security_group_rule_id(match.group("sg"), match.group("protocol"), ports, remote), None)
+
+        return (kind, match.group("resource"), user_id)
+
+    return None
+
+
+
+class AlertIndex():
+    """
+    This class is used to index the unread alerts of a project by (kind, resource_id, user_id).
+    """
+
+    def __init__(self, unread_alerts):
+        """
+        Initialize the AlertIndex object.
+
+        :param unread_alerts: (list) The unread alerts (id, user_id, message, kind, resource_id)
+        """
+        self.alerts = dict()
+
+        for (id, user_id, message, kind, resource_id) in unread_alerts:
+            # Alerts without key are left over by the database migration
+            if kind is None:
+                continue
+            self.add(kind, resource_id, user_id, (id, user_id, message))
+
+
+
+    def __len__(self):
+        """
+        Give the number of indexed alerts.
+
+        :return: (int) The number of indexed alerts
+        """
+        return len(self.alerts)
+
+
+
+    def get(self, kind, resource_id, user_id=None):
+        """
+        Look for a matching unread alert.
+
+        :param kind: (str) The alert kind
+        :param resource_id: (str) The resource concerned by the alert
+        :param user_id: (str) The user concerned by the alert
+        :return: (tuple) The matching alert (id, user_id, message), or None
+        """
+        if kind in SECURITY_GROUP_ALERTS:
+            user_id = None
+        return self.alerts.get((kind, resource_id, user_id))
+
+
+
+    def add(self, kind, resource_id, user_id, alert):
+        """
+        Index an alert.
+
+        :param kind: (str) The alert kind
+        :param resource_id: (str) The resource concerned by the alert
+        :param user_id: (str) The user concerned by the alert
+        :param alert: (tuple) The alert (id, user_id, message)
+        """
+        if kind in SECURITY_GROUP_ALERTS:
+            user_id = None
+        self.alerts[(kind, resource_id, user_id)] = alert
+
+
+
+class ProjectAlerts():
+    """
+    This class is used to create or update the alerts of a monitored project.
+    """
+
+    def __init__(self, database, project_id, log, batch_size=None):
+        """
+        Initialize the ProjectAlerts object.
+        The unread alerts of the project are loaded and indexed once.
+
+        :param database: (gerenuk.database.Database) The database
+        :param project_id: (str) The ID of monitored project
+        :param log: (logging.Logger) The logger to use
+        :param batch_size: (int) The number of buffered alerts per write (None or 0 for database.batch_size, written at flush only)
+        """
+        self.database = database
+        self.project_id = project_id
+        self.log = log
+        self.batch_size = batch_size if batch_size is not None and batch_size > 0 else None
+        self.timestamp = datetime.datetime.now()
+        self.buffer = dict()
+
+        sql = 'SELECT id, uuid, message, kind, resource_id FROM user_alerts WHERE project=%s AND status=1;'
+        self.index = AlertIndex(self.database.fetchall(sql, (project_id,)))
+        self.log.debug("%d unread alert(s) indexed for project %s" % (len(self.index), project_id))
+
+
+
+    def notify(self, kind, resource_id, user_id, project, severity, message, subject, reason):
+        """
+        Create an alert, or update the matching unread alert if its message changed.
+        The write is buffered until the next flush.
+
+        :param kind: (str) The alert kind
+        :param resource_id: (str) The resource concerned by the alert
+        :param user_id: (str) The user concerned by the alert (None for all members of project)
+        :param project: (str) The project concerned by the alert
+        :param severity: (int) The alert severity
+        :param message: (str) The alert message
+        :param subject: (str) The alert subject, for logging (e.g. "instance <uuid>")
+        :param reason: (str) The alert reason, for logging (e.g. "in error")
+        """
+        if kind in SECURITY_GROUP_ALERTS:
+            user_id = None
+
+        matching_alert = self.index.get(kind, resource_id, user_id)
+
+        # Keep unchanged existing alerts
+        if matching_alert:
+            if matching_alert[2] == message:
+                self.log.debug("The %s has matching unread alert in database. Up to date" % subject)
+                return
+            self.log.info("The %s has matching unread alert in database. Updating old messages..." % subject)
+        else:
+            self.log.info("Create alert for %s (%s)" % (subject, reason))
+
+        # Last write wins for a given alert key
+        self.buffer[(kind, resource_id, user_id)] = (user_id, project, severity, message, self.timestamp, kind, resource_id)
+
+        alert_id = matching_alert[0] if matching_alert else None
+        self.index.add(kind, resource_id, user_id, (alert_id, user_id, message))
+
+        if self.batch_size and len(self.buffer) >= self.batch_size:
+            self.flush()
+
+
+
+    def flush(self):
+        """
+        Write the buffered alerts as multi-rows upserts.
+        Nothing is commited: buffered alerts are part of the project transaction.
+
+        :return: (int) The number of written alerts
+        """
+        if not self.buffer:
+            return 0
+
+        # Create new alerts, or update the unread alerts having the same key (see user_alerts.unread_key)
+        sql =  'INSERT INTO user_alerts(uuid, project, severity, message, timestamp, kind, resource_id) '
+        sql += 'VALUES(%s, %s, %s, %s, %s, %s, %s) '
+        sql += 'ON DUPLICATE KEY UPDATE timestamp=IF(message<=>VALUES(message), timestamp, VALUES(timestamp)), message=VALUES(message);'
+
+        written = len(self.buffer)
+        self.database.executemany(sql, list(self.buffer.values()), self.batch_size)
+        self.buffer.clear()
+
+        self.log.debug("%d alert(s) written for project %s" % (written, self.project_id))
+        return written
@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sat Oct 17 08:26:40 PM CEST 2026
+
+import datetime
+import hashlib
+import json
+
+
+def fingerprint(*state):
+    """
+    Compute the fingerprint of a resource state.
+
+    :param state: (list) The state items (JSON serializable)
+    :return: (str) The state fingerprint (40 hexadecimal chars)
+    """
+    return hashlib.sha1(json.dumps(state, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+
+def threshold_deadline(updated_at, delay):
+    """
+    Give the time when a resource crosses a threshold expressed in days since its last update.
+
+    :param updated_at: (datetime.datetime) The last update of the resource
+    :param delay: (int) The threshold (in days)
+    :return: (datetime.datetime) The threshold crossing time
+    """
+    return datetime.datetime.combine(updated_at.date() + datetime.timedelta(days=delay), datetime.time())
+
+
+
+class AlwaysCheck():
+    """
+    This class is used when change detection is disabled: every resource is checked on every pass.
+    """
+
+    def check(self, resource_id, fingerprint):
+        """
+        Check if a resource has to be evaluated.
+
+        :param resource_id: (str) The resource ID
+        :param fingerprint: (str) The resource state fingerprint
+        :return: (bool) Always True
+        """
+        return True
+
+
+
+    def expect(self, resource_id, deadline):
+        """
+        Ask for a new evaluation of a resource at a given time.
+
+        :param resource_id: (str) The resource ID
+        :param deadline: (datetime.datetime) The time of next evaluation
+        """
+        pass
+
+
+
+    def save(self):
+        """
+        Save the resources states.
+        """
+        pass
+
+
+
+class ResourceStates():
+    """
+    This class is used to detect the resources of a project whose state changed since the previous pass.
+    A resource is evaluated again when its fingerprint changed, or when its next check time is reached
+    (a threshold was crossed or the recheck interval elapsed).
+    """
+
+    def __init__(self, database, project_id, recheck_interval, salt=""):
+        """
+        Initialize the ResourceStates object.
+        The states saved by the previous pass are loaded.
+
+        :param database: (gerenuk.database.Database) The database
+        :param project_id: (str) The ID of monitored project
+        :param recheck_interval: (int) The maximum time between two evaluations of a resource (in seconds)
+        :param salt: (str) The project settings fingerprint (a settings change invalidates all states)
+        """
+        self.database = database
+        self.project_id = project_id
+        self.salt = salt
+        self.now = datetime.datetime.now()
+        self.default_next_check = self.now + datetime.timedelta(seconds=recheck_interval)
+
+        self.states = dict()
+        sql = 'SELECT resource_id, fingerprint, next_check FROM resources_state WHERE project=%s;'
+        for (resource_id, state_fingerprint, next_check) in self.database.fetchall(sql, (project_id,)):
+            self.states[resource_id] = (state_fingerprint, next_check)
+
+        self.seen = set()
+        self.updates = dict()
+
+
+
+    def check(self, resource_id, fingerprint):
+        """
+        Check if a resource has to be evaluated.
+        If so, its new state is recorded with the default next check time.
+
+        :param resource_id: (str) The resource ID
+        :param fingerprint: (str) The resource state fingerprint
+        :return: (bool) True if the resource has to be evaluated
+        """
+        fingerprint = hashlib.sha1((self.salt + fingerprint).encode("utf-8")).hexdigest()
+
+        self.seen.add(resource_id)
+        state = self.states.get(resource_id)
+        if state is not None and state[0] == fingerprint and state[1] > self.now:
+            return False
+
+        self.updates[resource_id] = (fingerprint, self.default_next_check)
+        return True
+
+
+
+    def expect(self, resource_id, deadline):
+        """
+        Ask for a new evaluation of a resource at a given time (e.g. when a threshold will be crossed).
+
+        :param resource_id: (str) The resource ID
+        :param deadline: (datetime.datetime) The time of next evaluation
+        """
+        if resource_id in self.updates and self.now < deadline < self.updates[resource_id][1]:
+            self.updates[resource_id] = (self.updates[resource_id][0], deadline)
+
+
+
+    def save(self):
+        """
+        Save the states of evaluated resources, and forget the resources which disappeared.
+        """
+        sql =  'INSERT INTO resources_state (project, resource_id, fingerprint, next_check) VALUES (%s, %s, %s, %s) '
+        sql += 'ON DUPLICATE KEY UPDATE fingerprint=VALUES(fingerprint), next_check=VALUES(next_check);'
+        self.database.executemany(sql, [(self.project_id, resource_id) + update for (resource_id, update) in self.updates.items()])
+
+        sql = 'DELETE FROM resources_state WHERE project=%s AND resource_id=%s;'
+        self.database.executemany(sql, [(self.project_id, resource_id) for resource_id in set(self.states) - self.seen])
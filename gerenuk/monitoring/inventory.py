@@ -0,0 +1,264 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sat Oct 17 04:02:19 PM CEST 2026
+
+import collections
+
+
+# Lightweight records of OpenStack resources (picklable, so they can be sent to worker processes)
+Instance = collections.namedtuple("Instance", ["id", "name", "status", "created", "updated", "user_id", "tenant_id", "flavor_id"])
+Volume = collections.namedtuple("Volume", ["id", "name", "status", "created_at", "updated_at", "user_id", "tenant_id", "size", "bootable"])
+
+
+
+def instance_record(server):
+    """
+    Build the lightweight record of a nova server.
+
+    :param server: (novaclient.v2.servers.Server) The nova server
+    :return: (Instance) The instance record
+    """
+    return Instance(
+        server.id, server.name, server.status, server.created, server.updated,
+        server.user_id, server.tenant_id, server.flavor.get("id")
+    )
+
+
+
+def volume_record(volume):
+    """
+    Build the lightweight record of a cinder volume.
+
+    :param volume: (cinderclient.v3.volumes.Volume) The cinder volume
+    :return: (Volume) The volume record
+    """
+    return Volume(
+        volume.id, volume.name, volume.status, volume.created_at, volume.updated_at,
+        volume.user_id, getattr(volume, "os-vol-tenant-attr:tenant_id"), volume.size, volume.bootable
+    )
+
+
+
+class ProjectInventory():
+    """
+    This class is used to store the resources of an openstack project.
+    """
+
+    def __init__(self, project_id, flavors=None):
+        """
+        Initialize the ProjectInventory object.
+
+        :param project_id: (str) The ID of the project
+        :param flavors: (dict) The vCPUs of each flavor, by flavor ID
+        """
+        self.project_id = project_id
+        self.flavors = flavors if flavors is not None else dict()
+        self.instances = list()
+        self.volumes = list()
+        self.security_groups = list()
+
+
+
+def iter_pages(list_resources, page_size, **kwargs):
+    """
+    Iterate over a paginated listing, one page of resources at a time.
+    Each page is asked with the ID of the last resource of previous page as marker,
+    until an empty page is returned (the APIs silently cap the page size, e.g. to osapi_max_limit).
+
+    :param list_resources: (function) The listing function (e.g. nova.servers.list), accepting marker and limit
+    :param page_size: (int) The number of resources per page (0 to use the default page size of the API)
+    :param kwargs: (dict) The other arguments of the listing function
+    :return: (generator) The listed resources
+    """
+    if page_size > 0:
+        kwargs["limit"] = page_size
+
+    marker = None
+    while True:
+        page = list_resources(marker=marker, **kwargs)
+        if len(page) == 0:
+            break
+
+        yield from page
+        marker = page[-1].id
+
+
+
+def fetch_instances_changes(nova, instances, since, page_size=0):
+    """
+    List the nova servers changed since a previous listing, and merge them into it.
+    Deleted servers are listed by nova when the changes-since filter is used.
+
+    :param nova: (novaclient.client) The nova client
+    :param instances: (list) The instances of previous listing (Instance)
+    :param since: (datetime.datetime) The time of previous listing (UTC)
+    :param page_size: (int) The number of servers per page (0 to use the default page size of the API)
+    :return: (list) The up to date instances (Instance)
+    """
+    merged = dict((instance.id, instance) for instance in instances)
+
+    search_opts = {"changes-since": since.strftime("%Y-%m-%dT%H:%M:%SZ")}
+    for server in iter_pages(nova.servers.list, page_size, search_opts=search_opts):
+        if server.status.upper() in ("DELETED", "SOFT_DELETED"):
+            merged.pop(server.id, None)
+        else:
+            merged[server.id] = instance_record(server)
+
+    return list(merged.values())
+
+
+
+def fetch_project_inventory(project_id, nova, cinder, neutron, page_size=0, previous_instances=None, since=None, stream=True):
+    """
+    List the resources of an openstack project through its own clients.
+    When streamed, instances and volumes are generators reading the listings page by page,
+    so they can be iterated only once.
+
+    :param project_id: (str) The ID of the project
+    :param nova: (novaclient.client) The nova client
+    :param cinder: (cinderclient.client) The cinder client
+    :param neutron: (neutronclient.v2_0.client) The neutron client
+    :param page_size: (int) The number of resources per page (0 to use the default page size of the API)
+    :param previous_instances: (list) The instances of previous listing (None for a full listing)
+    :param since: (datetime.datetime) The time of previous listing (UTC)
+    :param stream: (bool) True to stream instances and volumes, False to get lists
+    :return: (ProjectInventory) The project inventory
+    """
+    inventory = ProjectInventory(project_id)
+
+    for flavor in nova.flavors.list():
+        inventory.flavors[flavor.id] = flavor.vcpus
+
+    if previous_instances is None:
+        inventory.instances = (instance_record(server) for server in iter_pages(nova.servers.list, page_size))
+    else:
+        inventory.instances = fetch_instances_changes(nova, previous_instances, since, page_size)
+    inventory.volumes = (volume_record(volume) for volume in iter_pages(cinder.volumes.list, page_size))
+
+    if not stream:
+        inventory.instances = list(inventory.instances)
+        inventory.volumes = list(inventory.volumes)
+
+    inventory.security_groups = [sg for sg in neutron.list_security_groups()["security_groups"] if sg["project_id"] == project_id]
+
+    return inventory
+
+
+
+class Inventory():
+    """
+    This class is used to take an admin-scoped snapshot of all openstack resources, bucketed by project.
+    """
+
+    def __init__(self, projects, flavors):
+        """
+        Initialize the Inventory object.
+
+        :param projects: (dict) The project IDs, by (lowercase domain name, project name)
+        :param flavors: (dict) The vCPUs of each flavor, by flavor ID
+        """
+        self.projects = projects
+        self.flavors = flavors
+        self.buckets = dict()
+
+
+
+    def get_project_id(self, domain_name, project_name):
+        """
+        Resolve the ID of a project.
+
+        :param domain_name: (str) The name of the project domain
+        :param project_name: (str) The name of the project
+        :return: (str) The ID of the project ("" if unknown)
+        """
+        return self.projects.get((domain_name.lower(), project_name), "")
+
+
+
+    def get_bucket(self, project_id):
+        """
+        Give the inventory of a project, creating it on first use.
+
+        :param project_id: (str) The ID of the project
+        :return: (ProjectInventory) The project inventory
+        """
+        if not project_id in self.buckets:
+            self.buckets[project_id] = ProjectInventory(project_id, self.flavors)
+        return self.buckets[project_id]
+
+
+
+    def get_project(self, domain_name, project_name):
+        """
+        Give the inventory of a project.
+
+        :param domain_name: (str) The name of the project domain
+        :param project_name: (str) The name of the project
+        :return: (ProjectInventory) The project inventory (None if the project is unknown)
+        """
+        project_id = self.get_project_id(domain_name, project_name)
+        if not project_id:
+            return None
+        return self.get_bucket(project_id)
+
+
+
+    @classmethod
+    def fetch(cls, keystone, nova, cinder, neutron, page_size=0):
+        """
+        List the resources of all projects with admin-scoped clients (one listing per resource type).
+        Servers and volumes are listed page by page with markers: a single call only returns the first page.
+
+        :param keystone: (keystoneclient.client) The keystone client
+        :param nova: (novaclient.client) The nova client
+        :param cinder: (cinderclient.client) The cinder client
+        :param neutron: (neutronclient.v2_0.client) The neutron client
+        :param page_size: (int) The number of servers and volumes per page (0 to use the default page size of the API)
+        :return: (Inventory) The inventory snapshot
+        """
+        # Project names are only unique within a domain (domain names are case insensitive)
+        domains = dict()
+        for domain in keystone.domains.list():
+            domains[domain.id] = domain.name.lower()
+
+        projects = dict()
+        for project in keystone.projects.list():
+            projects[(domains.get(project.domain_id), project.name)] = project.id
+
+        # Private flavors are listed too
+        flavors = dict()
+        for flavor in nova.flavors.list(is_public=None):
+            flavors[flavor.id] = flavor.vcpus
+
+        inventory = cls(projects, flavors)
+
+        for server in iter_pages(nova.servers.list, page_size, search_opts={"all_tenants": True}):
+            instance = instance_record(server)
+            inventory.get_bucket(instance.tenant_id).instances.append(instance)
+
+        for volume in iter_pages(cinder.volumes.list, page_size, search_opts={"all_tenants": True}):
+            volume = volume_record(volume)
+            inventory.get_bucket(volume.tenant_id).volumes.append(volume)
+
+        for sg in neutron.list_security_groups()["security_groups"]:
+            inventory.get_bucket(sg["project_id"]).security_groups.append(sg)
+
+        return inventory
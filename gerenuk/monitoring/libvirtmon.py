@@ -20,11 +20,16 @@
 # Cyrille TOULET <cyrille.toulet@univ-lille.fr>
 # Mon May  3 09:02:09 AM CEST 2021
 
+import concurrent.futures
 import multiprocessing
 import configparser
 import platform
+import asyncio
 import datetime
 import gerenuk
+import gerenuk.series
+import gerenuk.database
+import gerenuk.monitoring.rollups
 import logging
 import psutil
 import time
@@ -32,6 +37,20 @@ import sys
 import os
 
 
+# The storages of instances series
+SERIES_BACKENDS = ("array", "numpy")
+
+# The collection engines
+ENGINES = ("sync", "asyncio")
+
+# The instances_monitoring fields holding the series of an instance
+SERIES_FIELDS = ['uuid', 'hypervisor', 'vcores', 'vram']
+SERIES_FIELDS += ['hourly_vcpu_usage', 'daily_vcpu_usage', 'weekly_vcpu_usage']
+SERIES_FIELDS += ['hourly_cpu_usage', 'daily_cpu_usage', 'weekly_cpu_usage']
+SERIES_FIELDS += ['hourly_mem_usage', 'daily_mem_usage', 'weekly_mem_usage']
+SERIES_FIELDS += ['deleted', 'last_update']
+
+
 
 class LibvirtMonitor():
     """
@@ -81,6 +100,30 @@ class LibvirtMonitor():
             "weekly": 7
         }
 
+        # Series storage (NumPy matrices allow vectorized rollups)
+        self.series_backend = self.config.get("libvirt", "series_backend")
+        if not self.series_backend in SERIES_BACKENDS:
+            raise gerenuk.ConfigError("unknown libvirt series backend " + self.series_backend)
+
+        self.matrices = None
+        if self.series_backend == "numpy":
+            self.matrices = dict()
+            for period in ["hourly", "daily", "weekly"]:
+                for metric in ["vcpu", "cpu", "mem"]:
+                    self.matrices[(period, metric)] = gerenuk.series.SeriesMatrix(self.NB_VALUES[period])
+
+        # Collection engine (asyncio overlaps the sampling of a pass with the database flush of previous pass)
+        self.engine = self.config.get("libvirt", "engine")
+        if not self.engine in ENGINES:
+            raise gerenuk.ConfigError("unknown libvirt engine " + self.engine)
+
+        self.loop = None
+        self.pending_flush = None
+        if self.engine == "asyncio":
+            self.loop = asyncio.new_event_loop()
+            self.sampling_executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="gerenuk-sampling")
+            self.database_executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="gerenuk-database")
+
         # LibVirt
         self.log.debug("Connecting to libvirt...")
         self.connection = libvirt.openReadOnly(None)
@@ -110,37 +153,35 @@ class LibvirtMonitor():
         self.log.debug("Hypervisor successfully analysed")
 
         # Stats
+        self.bulk_stats_supported = True
         self.monitoring = dict()
-        self.known_uuids = list()
-        self.loaded_stats = list()
+        self.known_uuids = set()
 
-        try:
-            self.log.debug("Loading existing stats...")
-            self.load_stats()
-            self.log.debug("Existing stats successfully loaded")
-        except mysql.connector.errors.OperationalError as e:
-            self.log.warning("Connection with database lost, try to reconnect...")
-            retries = 0
-            succeed = False
-
-            while retries < self.config.get_int("database", "max_conn_retries") and not(succeed):
-                retries += 1
-                wait = self.config.get_int("database", "wait_before_conn_retry") * retries
-                self.log.warning("Wait %d seconds before new attempt..." % wait)
-                time.sleep(wait)
-                
-                try:
-                    self.database.close()
-                    self.db_connect()
-                except mysql.connector.Error:
-                    self.log.warning("Failed at attempt #%d!" % retries)
-                    continue
-
-                succeed = True
-                self.log.warning("Connection with database successfully reestablished following connection lost")
-
-            if not(succeed):
-                raise gerenuk.ConnectivityError(e)
+        self.log.debug("Loading existing stats...")
+        self.database.run(self.load_stats)
+        self.log.debug("Existing stats successfully loaded")
+
+        # Rollups
+        self.rollups = self.database.run(gerenuk.monitoring.rollups.RollupScheduler, self.database, self.hypervisor["hostname"])
+
+
+
+    def close(self):
+        """
+        Close the libvirt connection and release the database connection to the shared pool.
+        With the asyncio engine, the pending database flush is awaited first.
+        """
+        if self.loop is not None:
+            try:
+                self.loop.run_until_complete(self.wait_flush())
+            finally:
+                self.sampling_executor.shutdown()
+                self.database_executor.shutdown()
+                self.loop.close()
+                self.loop = None
+
+        self.connection.close()
+        self.database.close()
 
 
 
@@ -172,296 +213,555 @@ class LibvirtMonitor():
         """
         Try to connect to the database
         :raise: (gerenuk.DependencyError) When a required dependency is missing
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
+        """
+        self.database = gerenuk.database.Database(self.config)
+
+    
+
+    def collect_stats(self):
+        """
+        Collect all libvirt domains stats.
+        """
+        if self.loop is not None:
+            self.loop.run_until_complete(self.collect_stats_async())
+            return
+
+        collected_stats = self.sample_domains()
+        self.cache_stats(collected_stats)
+
+        self.log.debug("Saving cached stats...")
+        self.database.run(self.save_stats)
+        self.log.debug("Cached stats successfully saved")
+        self.log.debug("Database pools metrics: %s" % gerenuk.database.get_pools_metrics())
+
+
+
+    async def collect_stats_async(self):
+        """
+        Collect all libvirt domains stats (asyncio engine).
+        Domains are sampled in an executor while the stats of previous pass are flushed to database,
+        and the flush of this pass runs in background until the next pass needs it.
+        """
+        loop = asyncio.get_running_loop()
+
+        collected_stats = await loop.run_in_executor(self.sampling_executor, self.sample_domains)
+        await self.wait_flush()
+
+        self.cache_stats(collected_stats)
+        await loop.run_in_executor(self.database_executor, self.database.run, self.merge_migrated_stats)
+
+        self.log.debug("Saving cached stats in background...")
+        rows = self.build_rows()
+        self.pending_flush = loop.run_in_executor(self.database_executor, self.database.run, self.write_stats, rows)
+
+
+
+    async def wait_flush(self):
+        """
+        Wait for the database flush of previous pass (its errors are raised here).
+        """
+        if self.pending_flush is None:
+            return
+
+        (pending_flush, self.pending_flush) = (self.pending_flush, None)
+        await pending_flush
+        self.log.debug("Cached stats successfully saved")
+        self.log.debug("Database pools metrics: %s" % gerenuk.database.get_pools_metrics())
+
+
+
+    def sample_domains(self):
+        """
+        Sample all libvirt domains with the configured sampling mode.
+
+        :return: (list) The collected stats dicts
+        """
+        settings = self.config.snapshot().libvirt
+        sampling_time = settings.sampling_time
+        sampling_mode = settings.sampling_mode
+        if not sampling_mode in ("sequential", "concurrent", "bulk"):
+            raise gerenuk.ConfigError("unknown libvirt sampling mode " + sampling_mode)
+
+        collected_stats = None
+        if sampling_mode == "bulk" and self.bulk_stats_supported:
+            self.log.debug("Sampling during %ds (bulk mode)" % sampling_time)
+            collected_stats = self.sample_domains_in_bulk(sampling_time)
+
+            if collected_stats is None:
+                self.log.warning("Bulk domain stats not supported by libvirt, falling back to concurrent sampling")
+                self.bulk_stats_supported = False
+
+        if collected_stats is None:
+            self.log.debug("Getting libvirt domain list")
+            domain_ids = self.connection.listDomainsID()
+
+            if sampling_mode == "sequential":
+                self.log.debug("Sampling during %ds (sequential mode)" % sampling_time)
+                collected_stats = self.sample_domains_sequentially(domain_ids, sampling_time)
+            else:
+                self.log.debug("Sampling during %ds (concurrent mode)" % sampling_time)
+                collected_stats = self.sample_domains_concurrently(domain_ids, sampling_time)
+
+        return collected_stats
+
+
+
+    def cache_stats(self, collected_stats):
+        """
+        Store collected stats in cache, and roll them up when needed.
+
+        :param collected_stats: (list) The collected stats dicts
+        """
+        for stats in collected_stats:
+            self.log.debug("Storing collected stats in cache...")
+            self.store_stats(stats)
+            self.log.debug("Collected stats successfully stored in cache...")
+
+        self.rollup_stats([stats["uuid"] for stats in collected_stats])
+
+
+
+    def sample_domains_sequentially(self, domain_ids, sampling_time):
+        """
+        Sample libvirt domains one after another.
+        Each domain is sampled during sampling_time, so a pass lasts len(domain_ids) * sampling_time.
+
+        :param domain_ids: (list) The libvirt domain IDs to sample
+        :param sampling_time: (int) The sampling duration (in seconds)
+        :return: (list) The collected stats dicts
         """
         try:
-            import mysql.connector
+            import libvirt
         except Exception as e:
             raise gerenuk.DependencyError(e)
 
-        self.database = mysql.connector.connect(
-            host=self.config.get("database", "db_host"),
-            user=self.config.get("database", "db_user"),
-            password=self.config.get("database", "db_pass"),
-            database=self.config.get("database", "db_name"),
-            connection_timeout=self.config.get_int("database", "db_timeout")
-        )
-        self.db_cursor = self.database.cursor()
+        collected_stats = list()
 
-    
+        for domain_id in domain_ids:
+            self.log.info("Collecting %s domain stats..." % domain_id)
+            try:
+                domain = self.connection.lookupByID(domain_id)
+                snapshot_1 = self.take_snapshot(domain, describe=True)
+                time.sleep(sampling_time)
+                snapshot_2 = self.take_snapshot(domain)
+                collected_stats.append(self.compute_stats(snapshot_1, snapshot_2))
+            except libvirt.libvirtError:
+                # The instance may be deleted during sleeping time
+                # If so, go to the next libvirt domain
+                continue
+            except (KeyError, ZeroDivisionError) as e:
+                self.log.warning("Unable to collect stats of domain %s: %s" % (domain_id, repr(e)))
+                continue
 
-    def collect_stats(self):
+            self.log.debug("Stats successfully collected for domain %s" % domain_id)
+
+        return collected_stats
+
+
+
+    def sample_domains_concurrently(self, domain_ids, sampling_time):
         """
-        Colelct all libvirt domains stats.
+        Sample all libvirt domains during the same sampling window.
+        The first snapshot of every domain is taken before a single sleep, so a pass lasts about sampling_time.
+
+        :param domain_ids: (list) The libvirt domain IDs to sample
+        :param sampling_time: (int) The sampling duration (in seconds)
+        :return: (list) The collected stats dicts
         """
         try:
-            import mysql.connector
+            import libvirt
         except Exception as e:
             raise gerenuk.DependencyError(e)
 
-        self.log.debug("Getting libvirt domain list")
-        domain_ids = self.connection.listDomainsID()
-        sampling_time = self.config.get_int("libvirt", "sampling_time")
-        self.log.debug("Sampling during %ds" % sampling_time)
-
+        first_snapshots = dict()
         for domain_id in domain_ids:
             self.log.info("Collecting %s domain stats..." % domain_id)
             try:
                 domain = self.connection.lookupByID(domain_id)
+                first_snapshots[domain_id] = (domain, self.take_snapshot(domain, describe=True))
+            except libvirt.libvirtError:
+                # The instance may be deleted since domain listing
+                continue
+            except KeyError as e:
+                self.log.warning("Unable to collect stats of domain %s: %s" % (domain_id, repr(e)))
+                continue
 
-                vcores = domain.maxVcpus()
-                vram = domain.maxMemory() / 1024
+        time.sleep(sampling_time)
 
-                cpu_stats_1 = domain.getCPUStats(True)
-                mem_stats_1 = domain.memoryStats()
-                time.sleep(sampling_time)
-                cpu_stats_2 = domain.getCPUStats(True)
-                mem_stats_2 = domain.memoryStats()
-
-                t1 = cpu_stats_1[0]["cpu_time"]
-                t2 = cpu_stats_2[0]["cpu_time"]
-
-                cpu_usage = (t2 - t1) / vcores / 10.**9 / sampling_time
-                real_cpu_usage = (t2 - t1) / self.hypervisor["cores"] / 10.**9 / sampling_time
-                mem_stats_average = (mem_stats_1["actual"] + mem_stats_2["actual"]) / 2.
-                mem_usage = (mem_stats_average / 1024 / self.hypervisor["estimated_memory"])
-
-                stats = dict()
-                stats["uuid"] = domain.UUIDString()
-                stats["vcores"] = vcores
-                stats["vram"] = vram
-                stats["vcpu_usage"] = round(cpu_usage * 100., 2)
-                stats["cpu_usage"] = round(real_cpu_usage * 100., 2)
-                stats["mem_usage"] = round(mem_usage * 100., 2)
-            except:
+        collected_stats = list()
+        for domain_id in first_snapshots:
+            (domain, snapshot_1) = first_snapshots[domain_id]
+            try:
+                snapshot_2 = self.take_snapshot(domain)
+                collected_stats.append(self.compute_stats(snapshot_1, snapshot_2))
+            except libvirt.libvirtError:
                 # The instance may be deleted during sleeping time
                 # If so, go to the next libvirt domain
                 continue
+            except (KeyError, ZeroDivisionError) as e:
+                self.log.warning("Unable to collect stats of domain %s: %s" % (domain_id, repr(e)))
+                continue
 
             self.log.debug("Stats successfully collected for domain %s" % domain_id)
 
-            self.log.debug("Storing collected stats in cache...")
-            self.store_stats(stats)
-            self.log.debug("Collected stats successfully stored in cache...")
+        return collected_stats
+
+
 
+    def sample_domains_in_bulk(self, sampling_time):
+        """
+        Sample all active libvirt domains using bulk stats.
+        Each snapshot costs a single libvirt call whatever the number of domains.
+
+        :param sampling_time: (int) The sampling duration (in seconds)
+        :return: (list) The collected stats dicts (or None if bulk stats are not supported by libvirt)
+        """
         try:
-            self.log.debug("Saving cached stats...")
-            self.save_stats()
-            self.log.debug("Cached stats successfully saved")
-        except mysql.connector.errors.OperationalError as e:
-            self.log.warning("Unable to reach database, try to reconnect...")
-            retries = 0
-            succeed = False
-
-            while retries < self.config.get_int("database", "max_conn_retries") and not(succeed):
-                retries += 1
-                wait = self.config.get_int("database", "wait_before_conn_retry") * retries
-                self.log.warning("Wait %d seconds before attempt to reconnect to database" % wait)
-                time.sleep(wait)
-                
-                try:
-                    self.database.close()
-                    self.db_connect()
-                except mysql.connector.Error:
-                    self.log.warning("Try #%d failed" % retries)
-                    continue
-
-                succeed = True
-                self.log.warning("Try #%d succeed" % retries)
-
-            if not(succeed):
-                raise gerenuk.ConnectivityError(e)
-
-
-
-    def load_stats(self):
-        """
-        Load all collected stats from database.
-        """
-        # Get all instances uuids (including stopped instances)
-        sql = 'SELECT uuid FROM instances_monitoring WHERE hypervisor="%s";'
-        self.db_cursor.execute(sql % (self.hypervisor["hostname"],))
-        for row in self.db_cursor.fetchall():
-            self.known_uuids.append(row[0])
-
-        # Get running instances stats
-        local_uuids = list()
-        sql = "SELECT * FROM instances_monitoring"
-
-        operator = " WHERE"
-        domain_ids = self.connection.listDomainsID()
-        for domain_id in domain_ids:
-            domain = self.connection.lookupByID(domain_id)
-            local_uuids.append(domain.UUIDString())
-            sql += "%s uuid='%s'" % (operator, domain.UUIDString())
-            operator = " OR"
+            import libvirt
+        except Exception as e:
+            raise gerenuk.DependencyError(e)
 
-        if len(local_uuids) > 0:
-            self.log.info("Found %d existing instance(s) for this hypervisor in database" % len(local_uuids))
-            self.db_cursor.execute(sql)
-            rows = self.db_cursor.fetchall()
+        stats_flags = libvirt.VIR_DOMAIN_STATS_CPU_TOTAL | libvirt.VIR_DOMAIN_STATS_BALLOON
+        try:
+            first_snapshots = self.take_bulk_snapshots(stats_flags | libvirt.VIR_DOMAIN_STATS_VCPU, describe=True)
+        except AttributeError:
+            # libvirt-python < 1.2.8
+            return None
+        except libvirt.libvirtError as e:
+            if e.get_error_code() == libvirt.VIR_ERR_NO_SUPPORT:
+                return None
+            raise
+
+        time.sleep(sampling_time)
+        second_snapshots = self.take_bulk_snapshots(stats_flags)
+
+        collected_stats = list()
+        for uuid in first_snapshots:
+            # The instance may be deleted during sleeping time
+            # If so, go to the next libvirt domain
+            if not uuid in second_snapshots:
+                continue
 
-            for row in rows:
-                (uuid, hypervisor, vcores, vram) = row[0:4]
-                (hourly_vcpu_usage, daily_vcpu_usage, weekly_vcpu_usage) = row[4:7]
-                (hourly_cpu_usage, daily_cpu_usage, weekly_cpu_usage) = row[7:10]
-                (hourly_mem_usage, daily_mem_usage, weekly_mem_usage) = row[10:13]
-                (deleted, last_update) = row[13:]
+            try:
+                collected_stats.append(self.compute_stats(first_snapshots[uuid], second_snapshots[uuid]))
+            except ZeroDivisionError as e:
+                self.log.warning("Unable to collect stats of domain %s: %s" % (uuid, repr(e)))
+                continue
 
-                self.log.info("Loading existing stats of instance %s" % uuid)
+            self.log.debug("Stats successfully collected for domain %s" % uuid)
 
-                if not uuid in self.monitoring:
-                    self.monitoring[uuid] = {
-                        "info": {"vcores": 0, "vram": 0},
-                        "hourly": {"vcpu": [], "cpu": [], "mem": []},
-                        "daily": {"vcpu": [], "cpu": [], "mem": []},
-                        "weekly": {"vcpu": [], "cpu": [], "mem": []}
-                    }
+        return collected_stats
+
+
+
+    def take_bulk_snapshots(self, stats_flags, describe=False):
+        """
+        Take a CPU and memory snapshot of all active libvirt domains in a single call.
+
+        :param stats_flags: (int) The libvirt VIR_DOMAIN_STATS_* flags to request
+        :param describe: (bool) Also collect the domains vcores and vram
+        :return: (dict) The domain snapshots indexed by domain uuid
+        """
+        try:
+            import libvirt
+        except Exception as e:
+            raise gerenuk.DependencyError(e)
+
+        records = self.connection.getAllDomainStats(stats_flags, libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE)
+        timestamp = time.monotonic()
+
+        snapshots = dict()
+        for (domain, domain_stats) in records:
+            uuid = domain.UUIDString()
+            snapshot = dict()
+
+            if describe:
+                snapshot["uuid"] = uuid
+                snapshot["vcores"] = domain_stats.get("vcpu.maximum")
+                snapshot["vram"] = domain_stats.get("balloon.maximum")
+
+            snapshot["cpu_time"] = domain_stats.get("cpu.time")
+            snapshot["memory"] = domain_stats.get("balloon.current")
+            snapshot["timestamp"] = timestamp
+
+            if None in snapshot.values():
+                # Incomplete stats (e.g. no balloon driver)
+                self.log.warning("Incomplete bulk stats for domain %s" % uuid)
+                continue
+
+            if describe:
+                snapshot["vram"] = snapshot["vram"] / 1024
+
+            snapshots[uuid] = snapshot
+
+        return snapshots
+
+
+
+    def take_snapshot(self, domain, describe=False):
+        """
+        Take a CPU and memory snapshot of a libvirt domain.
+
+        :param domain: (libvirt.virDomain) The domain to sample
+        :param describe: (bool) Also collect the domain uuid, vcores and vram
+        :return: (dict) The domain snapshot
+        :raise: (KeyError) When the memory stats are not available (e.g. no balloon driver)
+        """
+        snapshot = dict()
 
-                self.monitoring[uuid]["info"]["vcores"] = int(vcores)
-                self.monitoring[uuid]["info"]["vram"] = int(vram)
+        if describe:
+            snapshot["uuid"] = domain.UUIDString()
+            snapshot["vcores"] = domain.maxVcpus()
+            snapshot["vram"] = domain.maxMemory() / 1024
 
-                if len(hourly_vcpu_usage) > 0:
-                    self.monitoring[uuid]["hourly"]["vcpu"] += [float(n) for n in hourly_vcpu_usage.split(',')]
+        snapshot["cpu_time"] = domain.getCPUStats(True)[0]["cpu_time"]
+        snapshot["memory"] = domain.memoryStats()["actual"]
+        snapshot["timestamp"] = time.monotonic()
 
-                if len(hourly_cpu_usage) > 0:
-                    self.monitoring[uuid]["hourly"]["cpu"] += [float(n) for n in hourly_cpu_usage.split(',')]
+        return snapshot
 
-                if len(hourly_mem_usage) > 0:
-                    self.monitoring[uuid]["hourly"]["mem"] += [float(n) for n in hourly_mem_usage.split(',')]
 
-                if len(daily_vcpu_usage) > 0:
-                    self.monitoring[uuid]["daily"]["vcpu"] += [float(n) for n in daily_vcpu_usage.split(',')]
 
-                if len(daily_cpu_usage) > 0:
-                    self.monitoring[uuid]["daily"]["cpu"] += [float(n) for n in daily_cpu_usage.split(',')]
+    def compute_stats(self, snapshot_1, snapshot_2):
+        """
+        Compute domain usage stats from two snapshots.
+
+        :param snapshot_1: (dict) The described snapshot taken at the beginning of sampling
+        :param snapshot_2: (dict) The snapshot taken at the end of sampling
+        :return: (dict) The domain stats
+        """
+        elapsed = snapshot_2["timestamp"] - snapshot_1["timestamp"]
+        cpu_time = snapshot_2["cpu_time"] - snapshot_1["cpu_time"]
+
+        cpu_usage = cpu_time / snapshot_1["vcores"] / 10.**9 / elapsed
+        real_cpu_usage = cpu_time / self.hypervisor["cores"] / 10.**9 / elapsed
+        mem_stats_average = (snapshot_1["memory"] + snapshot_2["memory"]) / 2.
+        mem_usage = (mem_stats_average / 1024 / self.hypervisor["estimated_memory"])
+
+        stats = dict()
+        stats["uuid"] = snapshot_1["uuid"]
+        stats["vcores"] = snapshot_1["vcores"]
+        stats["vram"] = snapshot_1["vram"]
+        stats["vcpu_usage"] = round(cpu_usage * 100., 2)
+        stats["cpu_usage"] = round(real_cpu_usage * 100., 2)
+        stats["mem_usage"] = round(mem_usage * 100., 2)
+
+        return stats
+
 
-                if len(daily_mem_usage) > 0:
-                    self.monitoring[uuid]["daily"]["mem"] += [float(n) for n in daily_mem_usage.split(',')]
 
-                if len(weekly_vcpu_usage) > 0:
-                    self.monitoring[uuid]["weekly"]["vcpu"] += [float(n) for n in weekly_vcpu_usage.split(',')]
+    def load_stats(self, uuids=None):
+        """
+        Load collected stats from database.
+        Loaded series are merged before the series already cached for the same instances.
 
-                if len(weekly_cpu_usage) > 0:
-                    self.monitoring[uuid]["weekly"]["cpu"] += [float(n) for n in weekly_cpu_usage.split(',')]
+        :param uuids: (list) The instances uuids to load (all running instances if not specified)
+        """
+        if uuids is None:
+            # Get all instances uuids (including stopped instances)
+            sql = 'SELECT uuid FROM instances_monitoring WHERE hypervisor=%s;'
+            for row in self.database.fetchall(sql, (self.hypervisor["hostname"],)):
+                self.known_uuids.add(row[0])
+
+            # Get running instances uuids
+            uuids = list()
+            for domain_id in self.connection.listDomainsID():
+                domain = self.connection.lookupByID(domain_id)
+                uuids.append(domain.UUIDString())
 
-                if len(weekly_mem_usage) > 0:
-                    self.monitoring[uuid]["weekly"]["mem"] += [float(n) for n in weekly_mem_usage.split(',')]
+        if len(uuids) > 0:
+            self.log.info("Looking for %d existing instance(s) in database" % len(uuids))
+            sql = "SELECT " + ", ".join(SERIES_FIELDS) + " FROM instances_monitoring WHERE uuid IN (" + gerenuk.database.placeholders(uuids) + ");"
+            rows = self.database.fetchall(sql, uuids)
 
-                self.loaded_stats.append(uuid)
+            for row in rows:
+                (uuid, hypervisor, vcores, vram) = row[0:4]
+                (hourly_vcpu_usage, daily_vcpu_usage, weekly_vcpu_usage) = row[4:7]
+                (hourly_cpu_usage, daily_cpu_usage, weekly_cpu_usage) = row[7:10]
+                (hourly_mem_usage, daily_mem_usage, weekly_mem_usage) = row[10:13]
+                (deleted, last_update) = row[13:15]
+
+                self.log.info("Loading existing stats of instance %s" % uuid)
+
+                if not uuid in self.monitoring:
+                    self.monitoring[uuid] = gerenuk.series.InstanceSeries(self.NB_VALUES, matrices=self.matrices)
+
+                self.monitoring[uuid].vcores = int(vcores)
+                self.monitoring[uuid].vram = int(vram)
+
+                series = {
+                    "hourly": {"vcpu": hourly_vcpu_usage, "cpu": hourly_cpu_usage, "mem": hourly_mem_usage},
+                    "daily": {"vcpu": daily_vcpu_usage, "cpu": daily_cpu_usage, "mem": daily_mem_usage},
+                    "weekly": {"vcpu": weekly_vcpu_usage, "cpu": weekly_cpu_usage, "mem": weekly_mem_usage}
+                }
+
+                for period in ["hourly", "daily", "weekly"]:
+                    for metric in ["vcpu", "cpu", "mem"]:
+                        self.monitoring[uuid].get(period, metric).merge_before(gerenuk.series.unpack_series(series[period][metric]))
+
+                self.known_uuids.add(uuid)
         else:
-            self.log.info("No existing instance for thir hypervisor in database")
+            self.log.info("No existing instance for this hypervisor in database")
 
 
 
     def store_stats(self, stats):
         """
         Store and rotate instance stats.
+        Daily and weekly series are fed by rollup_stats.
 
         :param stats: (tuple) the instance stats to store
         """
         uuid = stats["uuid"]
-        now = datetime.datetime.now()
 
         self.log.debug("Caching stats for instance %s" % uuid)
 
         if not uuid in self.monitoring:
-            self.monitoring[uuid] = {
-                "info": {"vcores": stats["vcores"], "vram": stats["vram"]},
-                "hourly": {"vcpu": [], "cpu": [], "mem": []},
-                "daily": {"vcpu": [], "cpu": [], "mem": []},
-                "weekly": {"vcpu": [], "cpu": [], "mem": []}
-            }
+            self.monitoring[uuid] = gerenuk.series.InstanceSeries(self.NB_VALUES, stats["vcores"], stats["vram"], self.matrices)
 
         # Hourly
-        self.monitoring[uuid]["hourly"]["vcpu"].append(stats["vcpu_usage"])
-        self.monitoring[uuid]["hourly"]["cpu"].append(stats["cpu_usage"])
-        self.monitoring[uuid]["hourly"]["mem"].append(stats["mem_usage"])
-
-        # Daily
-        if now.minute <= (self.config.get_int("libvirt", "monitoring_frequency") / 60):
-            hourly_vcpu_average = sum(float(i) for i in self.monitoring[uuid]["hourly"]["vcpu"]) / float(len(self.monitoring[uuid]["hourly"]["vcpu"]))
-            hourly_cpu_average = sum(float(i) for i in self.monitoring[uuid]["hourly"]["cpu"]) / float(len(self.monitoring[uuid]["hourly"]["cpu"]))
-            hourly_mem_average = sum(float(i) for i in self.monitoring[uuid]["hourly"]["mem"]) / float(len(self.monitoring[uuid]["hourly"]["mem"]))
-
-            self.monitoring[uuid]["daily"]["vcpu"].append(hourly_vcpu_average)
-            self.monitoring[uuid]["daily"]["cpu"].append(hourly_cpu_average)
-            self.monitoring[uuid]["daily"]["mem"].append(hourly_mem_average)
-
-        # Weekly
-        if now.minute <= (self.config.get_int("libvirt", "monitoring_frequency") / 60) and now.hour == 0:
-            daily_vcpu_average = sum(float(i) for i in self.monitoring[uuid]["daily"]["vcpu"]) / float(len(self.monitoring[uuid]["daily"]["vcpu"]))
-            daily_cpu_average = sum(float(i) for i in self.monitoring[uuid]["daily"]["cpu"]) / float(len(self.monitoring[uuid]["daily"]["cpu"]))
-            daily_mem_average = sum(float(i) for i in self.monitoring[uuid]["daily"]["mem"]) / float(len(self.monitoring[uuid]["daily"]["mem"]))
-
-            self.monitoring[uuid]["weekly"]["vcpu"].append(daily_vcpu_average)
-            self.monitoring[uuid]["weekly"]["cpu"].append(daily_cpu_average)
-            self.monitoring[uuid]["weekly"]["mem"].append(daily_mem_average)
-
-        # Rotate
-        for period in ["hourly", "daily", "weekly"]:
+        self.append_value(uuid, "hourly", "vcpu", stats["vcpu_usage"])
+        self.append_value(uuid, "hourly", "cpu", stats["cpu_usage"])
+        self.append_value(uuid, "hourly", "mem", stats["mem_usage"])
+
+
+
+    def rollup_stats(self, uuids):
+        """
+        Roll hourly series up into daily series each hour, and daily series into weekly series each day.
+        Each rollup runs once per boundary, on the first pass after it (see gerenuk.monitoring.rollups).
+        With the numpy series backend, the averages of all instances are computed at once.
+
+        :param uuids: (list) The uuids of instances sampled during this pass
+        """
+        for (source, target, missed) in self.rollups.due(datetime.datetime.now()):
+            if missed > 0:
+                self.log.warning("%d %s rollup(s) missed (no stats collected)" % (missed, target))
+
+            self.log.debug("Rolling %s stats up into %s stats for %d instance(s)" % (source, target, len(uuids)))
+
+            if self.matrices is None:
+                for uuid in uuids:
+                    for metric in ["vcpu", "cpu", "mem"]:
+                        self.append_value(uuid, target, metric, self.monitoring[uuid].get(source, metric).average())
+                continue
+
             for metric in ["vcpu", "cpu", "mem"]:
-                if len(self.monitoring[uuid][period][metric]) > self.NB_VALUES[period]:
-                    self.log.debug("%s:%s stat rotation for instance %s" % (period, metric, uuid))
-                    self.monitoring[uuid][period][metric] = self.monitoring[uuid][period][metric][1:self.NB_VALUES[period]+1]
+                (source_matrix, target_matrix) = (self.matrices[(source, metric)], self.matrices[(target, metric)])
+
+                source_rows = source_matrix.numpy.array([self.monitoring[uuid].get(source, metric).row for uuid in uuids], dtype=int)
+                target_rows = target_matrix.numpy.array([self.monitoring[uuid].get(target, metric).row for uuid in uuids], dtype=int)
+
+                rotated = target_matrix.append(target_rows, source_matrix.averages(source_rows))
+                if rotated > 0:
+                    self.log.debug("%s:%s stat rotation for %d instance(s)" % (target, metric, rotated))
+
+
+
+    def append_value(self, uuid, period, metric, value):
+        """
+        Append a value to an instance series (the oldest value is dropped when the series is full).
+
+        :param uuid: (str) The instance uuid
+        :param period: (str) The series period (hourly, daily or weekly)
+        :param metric: (str) The series metric (vcpu, cpu or mem)
+        :param value: (float) The value to append
+        """
+        if self.monitoring[uuid].get(period, metric).append(value) is not None:
+            self.log.debug("%s:%s stat rotation for instance %s" % (period, metric, uuid))
 
 
 
     def save_stats(self):
         """
         Save all collected stats to database.
+        The whole flush is done in a single transaction.
         """
-        # Tag all existing entries as deleted for hypervisor
-        self.log.debug("Tagging all existing entries as deleted for hypervisor %s" % self.hypervisor["hostname"])
-        sql = 'UPDATE instances_monitoring SET deleted="1" WHERE hypervisor="%s";'
-        self.db_cursor.execute(sql % (self.hypervisor["hostname"],))
+        self.merge_migrated_stats()
+        self.write_stats(self.build_rows())
 
+
+
+    def merge_migrated_stats(self):
+        """
+        Merge the stats saved by another hypervisor for the new instances (probably being migrated).
+        """
+        unknown_uuids = [uuid for uuid in self.monitoring if not uuid in self.known_uuids]
+        if len(unknown_uuids) > 0:
+            sql = "SELECT uuid FROM instances_monitoring WHERE hypervisor<>%s AND uuid IN (" + gerenuk.database.placeholders(unknown_uuids) + ");"
+            rows = self.database.fetchall(sql, [self.hypervisor["hostname"]] + unknown_uuids)
+            migrated_uuids = [row[0] for row in rows]
+
+            if len(migrated_uuids) > 0:
+                self.log.debug("Found %d existing entries linked to another hypervisor (probably being migrated)." % len(migrated_uuids))
+                self.log.debug("Merging existing stats from database...")
+                self.load_stats(migrated_uuids)
+                self.log.debug("Existing stats successfully merged")
+
+
+
+    def build_rows(self):
+        """
+        Build the instances_monitoring rows of all cached instances.
+
+        :return: (list) The rows (see SERIES_FIELDS and gerenuk.series.AGGREGATE_COLUMNS)
+        """
+        now = datetime.datetime.now()
+        rows = list()
         for uuid in self.monitoring:
-            if uuid in self.loaded_stats or uuid in self.known_uuids:
-                # UPDATE
-                self.log.debug("Found existing entry to update in database for instance %s" % uuid)
-                now = datetime.datetime.now()
-
-                sql = 'UPDATE instances_monitoring SET deleted="0", hypervisor="%s", last_update="%s", vcores="%d", vram="%d", '
-                sql += 'hourly_vcpu_usage="%s", hourly_cpu_usage="%s", hourly_mem_usage="%s", '
-                sql += 'daily_vcpu_usage="%s", daily_cpu_usage="%s", daily_mem_usage="%s", '
-                sql += 'weekly_vcpu_usage="%s", weekly_cpu_usage="%s", weekly_mem_usage="%s" '
-                sql += 'WHERE uuid="%s";'
-
-                values = (self.hypervisor["hostname"], now, self.monitoring[uuid]["info"]["vcores"], self.monitoring[uuid]["info"]["vram"])
+            values = (uuid, self.hypervisor["hostname"])
+            values += (int(self.monitoring[uuid].vcores), int(self.monitoring[uuid].vram))
+            for metric in ["vcpu", "cpu", "mem"]:
                 for period in ["hourly", "daily", "weekly"]:
-                    for metric in ["vcpu", "cpu", "mem"]:
-                        values += (','.join(str("%.1f" % d) for d in self.monitoring[uuid][period][metric]),)
-                values += (uuid,)
+                    values += (self.monitoring[uuid].get(period, metric).pack(),)
+            values += (0, now)
+            for metric in ["vcpu", "cpu", "mem"]:
+                for period in ["hourly", "daily", "weekly"]:
+                    series = self.monitoring[uuid].get(period, metric)
+                    values += gerenuk.series.summarize_series(series.values(), series.total)
+            rows.append(values)
 
-                self.db_cursor.execute(sql % values)
+        return rows
 
-            else:
-                # Migration security
-                sql = "SELECT * FROM instances_monitoring WHERE uuid='%s'" % (uuid,)
-                self.db_cursor.execute(sql)
-                if len(self.db_cursor.fetchall()) > 0:
-                    self.log.debug("Found existing entry for instance %s linked to another hypervisor (probably being migrated)." % uuid)
-                    self.log.debug("Reloading existing stats from database...")
-                    self.load_stats()
-                    self.log.debug("Existing stats successfully reloaded")
-                    continue
-
-                # INSERT
-                self.log.debug("Creating new entry in database for instance %s" % uuid)
-                fields = ['uuid', 'hypervisor', 'vcores', 'vram']
-                fields += ['hourly_vcpu_usage', 'daily_vcpu_usage', 'weekly_vcpu_usage']
-                fields += ['hourly_cpu_usage', 'daily_cpu_usage', 'weekly_cpu_usage']
-                fields += ['hourly_mem_usage', 'daily_mem_usage', 'weekly_mem_usage']
-
-                sql = 'INSERT INTO instances_monitoring (' + ', '.join(fields) + ') VALUES ("%s", "%s", "%d", "%d"' + ', "%s"'*9 + ');'
-
-                values = (uuid, self.hypervisor["hostname"])
-                values += (self.monitoring[uuid]["info"]["vcores"], self.monitoring[uuid]["info"]["vram"])
-                values += (str("%.1f" % self.monitoring[uuid]["hourly"]["vcpu"][0]), '', '')
-                values += (str("%.1f" % self.monitoring[uuid]["hourly"]["cpu"][0]), '', '')
-                values += (str("%.1f" % self.monitoring[uuid]["hourly"]["mem"][0]), '', '')
-
-                self.db_cursor.execute(sql % values)
-                self.loaded_stats.append(uuid)
-
-        self.database.commit()
+
+
+    def write_stats(self, rows):
+        """
+        Write instances_monitoring rows to database, in a single transaction.
+
+        :param rows: (list) The rows built by build_rows
+        """
+        try:
+            import mysql.connector
+        except Exception as e:
+            raise gerenuk.DependencyError(e)
+
+        try:
+            # Tag all existing entries as deleted for hypervisor
+            self.log.debug("Tagging all existing entries as deleted for hypervisor %s" % self.hypervisor["hostname"])
+            sql = 'UPDATE instances_monitoring SET deleted="1" WHERE hypervisor=%s;'
+            self.database.execute(sql, (self.hypervisor["hostname"],))
+
+            # Last rollups, saved with the rolled up stats
+            self.rollups.save()
+
+            # Upsert all cached instances
+            fields = SERIES_FIELDS + gerenuk.series.AGGREGATE_COLUMNS
+
+            sql = 'INSERT INTO instances_monitoring (' + ', '.join(fields) + ') VALUES (' + ', '.join(['%s'] * len(fields)) + ') '
+            sql += 'ON DUPLICATE KEY UPDATE ' + ', '.join(['%s=VALUES(%s)' % (field, field) for field in fields[1:]]) + ';'
+
+            self.log.debug("Upserting %d instance(s) in database" % len(rows))
+            if len(rows) > 0:
+                self.database.executemany(sql, rows)
+
+            self.database.commit()
+        except mysql.connector.Error:
+            try:
+                self.database.rollback()
+            except mysql.connector.Error:
+                pass
+            raise
+
+        self.known_uuids.update(row[0] for row in rows)
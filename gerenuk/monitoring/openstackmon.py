@@ -27,15 +27,62 @@ SEVERITY_ALERT = 1
 SEVERITY_WARNING = 2
 SEVERITY_CRITICAL = 3
 
+WORKER_TYPES = ("thread", "process")
+INVENTORY_MODES = ("project", "admin")
 
-from netaddr import *
+KEYSTONE_CREDENTIALS = ("auth_url", "project_domain_name", "user_domain_name", "project_name", "username", "password")
+
+
+import concurrent.futures
+import multiprocessing
+import threading
 import datetime
+import signal
 import gerenuk
+import gerenuk.database
+import gerenuk.monitoring.alerts
+import gerenuk.monitoring.changes
+import gerenuk.monitoring.inventory
+import gerenuk.monitoring.projectcache
+import gerenuk.monitoring.rules
+import gerenuk.monitoring.settings
 import logging
 import time
 import sys
 import os
-import re
+
+
+# The monitor used by the current worker process (see worker_type = process)
+WORKER_MONITOR = None
+
+
+
+def init_worker_process(monitor):
+    """
+    Initialize a monitoring worker process.
+    The database connections and OpenStack sessions inherited from the parent process are dropped,
+    and the signal handlers of the daemon are reset.
+
+    :param monitor: (gerenuk.monitoring.OpenstackMonitor) The monitor inherited from the parent process
+    """
+    global WORKER_MONITOR
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    monitor.local = threading.local()
+    monitor.clients = dict()
+    monitor.clients_lock = threading.Lock()
+    WORKER_MONITOR = monitor
+
+
+
+def monitor_project_in_worker_process(project, project_inventory=None):
+    """
+    Monitor an openstack project from a worker process.
+
+    :param project: (str) The project configuration file name
+    :param project_inventory: (gerenuk.monitoring.inventory.ProjectInventory) The project resources (None to list them)
+    """
+    WORKER_MONITOR.monitor_project_file(project, project_inventory)
 
 
 
@@ -77,7 +124,43 @@ class OpenstackMonitor():
 
         self.log.debug("gerenuk.monitoring dependencies successfully loaded")
 
-        # MySQL
+        # Workers
+        self.workers = self.config.get_int("openstack", "workers")
+        self.worker_type = self.config.get("openstack", "worker_type")
+        if not self.worker_type in WORKER_TYPES:
+            raise gerenuk.ConfigError("unknown openstack worker type " + self.worker_type)
+        self.executor = None
+
+        # Inventory
+        self.inventory_mode = self.config.get("openstack", "inventory")
+        if not self.inventory_mode in INVENTORY_MODES:
+            raise gerenuk.ConfigError("unknown openstack inventory mode " + self.inventory_mode)
+
+        # OpenStack clients, by keystone credentials
+        self.clients = dict()
+        self.clients_lock = threading.Lock()
+
+        # Change detection
+        self.change_detection = self.config.get_bool("openstack", "change_detection")
+        self.recheck_interval = self.config.get_int("openstack", "recheck_interval")
+        self.instances_cache = dict()
+
+        # Buffered alerts writes
+        self.alerts_batch_size = self.config.get_int("openstack", "alerts_batch_size")
+
+        # Compiled projects settings, by configuration file
+        self.project_settings = gerenuk.monitoring.settings.ProjectSettingsCache()
+
+        # Project IDs, by project name
+        project_id_cache_file = self.config.get("openstack", "project_id_cache_file")
+        self.project_ids = gerenuk.monitoring.projectcache.ProjectIdCache(
+            self.config.get_int("openstack", "project_id_cache_ttl"),
+            project_id_cache_file if project_id_cache_file else None,
+            self.log
+        )
+
+        # MySQL (one connection per worker thread)
+        self.local = threading.local()
         self.log.debug("Connecting to database...")
         self.db_connect()
         self.log.debug("Connection with database successfully established")
@@ -109,55 +192,164 @@ class OpenstackMonitor():
         """
         Try to connect to the database
         :raise: (gerenuk.DependencyError) When a required dependency is missing
+        :raise: (gerenuk.ConnectivityError) When the database remains unreachable
         """
-        # Dependencies
-        try:
-            import mysql.connector
-        except Exception as e:
-            raise gerenuk.DependencyError(e)
+        self.local.database = gerenuk.database.Database(self.config)
+
 
-        self.database = mysql.connector.connect(
-            host=self.config.get("database", "db_host"),
-            user=self.config.get("database", "db_user"),
-            password=self.config.get("database", "db_pass"),
-            database=self.config.get("database", "db_name"),
-            connection_timeout=self.config.get_int("database", "db_timeout")
-        )
-        self.db_cursor = self.database.cursor()
+
+    @property
+    def database(self):
+        """
+        Give the database of the current worker thread, connecting it on first use.
+
+        :return: (gerenuk.database.Database) The database
+        """
+        if not hasattr(self.local, "database"):
+            self.db_connect()
+        return self.local.database
 
     
 
+    def get_executor(self):
+        """
+        Give the pool of monitoring workers, starting it on first use.
+        The pool is kept between monitoring passes, so workers keep their database connections.
+
+        :return: (concurrent.futures.Executor) The pool of workers
+        """
+        if self.executor is None:
+            self.log.debug("Starting %d monitoring %s workers..." % (self.workers, self.worker_type))
+            if self.worker_type == "process":
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=init_worker_process,
+                    initargs=(self,)
+                )
+            else:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+
+
+    def close(self):
+        """
+        Stop the monitoring workers and release the database connection to the shared pool.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.database.close()
+
+
+
     def monitor_projects(self):
         """
         Browse all monitored projects from config files.
+        With several workers, projects are monitored in parallel and committed independently.
+
+        :raise: (gerenuk.MonitoringError) When the monitoring of a project failed
         """
         projects_dir = self.config.get("openstack", "projects_dir")
-        projects = os.listdir(projects_dir)
-
+        projects = [project for project in os.listdir(projects_dir) if project[-5:] == ".conf"]
+        self.project_settings.forget([projects_dir + "/" + project for project in projects])
+
+        # Projects resources (None to let each project list its own resources)
+        project_inventories = dict.fromkeys(projects)
+        if self.inventory_mode == "admin":
+            inventory = self.take_inventory()
+            for project in projects:
+                project_settings = self.load_project_settings(project)
+                project_inventory = inventory.get_project(project_settings.project_domain_name, project_settings.project_name)
+                if project_inventory is None:
+                    self.log.warning("Project %s not found in %s domain inventory, listing its own resources" % (project_settings.project_name, project_settings.project_domain_name))
+                project_inventories[project] = project_inventory
+
+        if self.workers <= 1:
+            for project in projects:
+                self.monitor_project_file(project, project_inventories[project])
+            return
+
+        if self.worker_type == "process":
+            monitor = monitor_project_in_worker_process
+        else:
+            monitor = self.monitor_project_file
+
+        executor = self.get_executor()
+        futures = dict()
         for project in projects:
-            if not(project[-5:] == ".conf"):
-                continue
+            futures[executor.submit(monitor, project, project_inventories[project])] = project
 
-            self.log.debug("Loading configuration for project %s..." % project)
-            project_config = gerenuk.Config()
-            project_config_file = projects_dir + "/" + project
-            project_config.load(project_config_file)
-            self.log.debug("Configuration file %s successfully loaded" % project_config_file)
+        # A failing project doesn't stop the monitoring of the others
+        failures = list()
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                self.log.error("Failed to monitor project %s: %s" % (futures[future], str(e)))
+                failures.append(futures[future])
 
-            self.log.info("Monitoring project %s..." % project)
-            self.monitor_project(project_config)
-            self.log.debug("Project %s successfully monitored" % project)
+        if failures:
+            raise gerenuk.MonitoringError("failed to monitor project(s) " + ", ".join(sorted(failures)))
 
 
-            
-    def monitor_project(self, project_config):
+
+    def load_project_settings(self, project):
         """
-        Monitor an openstack project.
+        Load the settings of a monitored project.
+        The configuration file is parsed again only when it changed.
+
+        :param project: (str) The project configuration file name
+        :return: (gerenuk.monitoring.settings.ProjectSettings) The project settings
+        :raise: (gerenuk.ConfigError) When the configuration file is invalid
+        """
+        project_config_file = self.config.get("openstack", "projects_dir") + "/" + project
+        project_settings = self.project_settings.get(project_config_file)
+        self.log.debug("Settings of project %s successfully loaded" % project)
+        return project_settings
+
 
-        :param project_config: (gerenuk.Config) The project configuration
+
+    def monitor_project_file(self, project, project_inventory=None):
+        """
+        Monitor an openstack project from its configuration file.
+
+        :param project: (str) The project configuration file name
+        :param project_inventory: (gerenuk.monitoring.inventory.ProjectInventory) The project resources (None to list them)
         :raise: (gerenuk.DependencyError) When a required dependency is missing
         :raise: (gerenuk.MonitoringError) When an internal error occurs
         """
+        project_settings = self.load_project_settings(project)
+
+        self.log.info("Monitoring project %s..." % project)
+        self.database.run(self.monitor_project, project_settings, project_inventory)
+        self.log.debug("Project %s successfully monitored" % project)
+
+
+
+    def get_credentials(self, config):
+        """
+        Give the keystone credentials of a configuration.
+
+        :param config: (gerenuk.Config) The configuration holding keystone credentials
+        :return: (tuple) The keystone credentials (see KEYSTONE_CREDENTIALS)
+        """
+        return tuple(config.get("keystone_authtoken", option) for option in KEYSTONE_CREDENTIALS)
+
+
+
+    def get_clients(self, config):
+        """
+        Give the OpenStack APIs clients, instantiating them on first use.
+        Clients are cached by credentials, so the keystone token is reused between passes
+        (keystoneauth renews it shortly before its expiration) and all clients of a project
+        share the HTTP connection pool of the same session.
+
+        :param config: (gerenuk.Config) The configuration holding keystone credentials
+        :return: (tuple) The keystone, nova, cinder and neutron clients
+        :raise: (gerenuk.DependencyError) When a required dependency is missing
+        """
         # Dependencies
         try:
             import keystoneauth1.session as keystone_session
@@ -169,53 +361,202 @@ class OpenstackMonitor():
         except Exception as e:
             raise gerenuk.DependencyError(e)
 
-        credentials = dict()
-        credentials["auth_url"] = project_config.get("keystone_authtoken", "auth_url")
-        credentials["project_domain_name"] = project_config.get("keystone_authtoken", "project_domain_name")
-        credentials["user_domain_name"] = project_config.get("keystone_authtoken", "user_domain_name")
-        credentials["project_name"] = project_config.get("keystone_authtoken", "project_name")
-        credentials["username"] = project_config.get("keystone_authtoken", "username")
-        credentials["password"] = project_config.get("keystone_authtoken", "password")
-
-        self.log.debug("Instantiating OpenStack APIs...")
-        auth = keystone_identity.v3.Password(**credentials)
-        session = keystone_session.Session(auth=auth)
-        keystone = keystone_client.Client(session=session)
-        nova = nova_client.Client(NOVA_API_VERSION, session=session)
-        cinder = cinder_client.Client(CINDER_API_VERSION, session=session)
-        neutron = neutron_client.Client(session=session)
-        self.log.debug("OpenStack APIs successfully instantiated")
+        key = self.get_credentials(config)
+
+        with self.clients_lock:
+            if key in self.clients:
+                self.log.debug("Reusing OpenStack APIs")
+                return self.clients[key]
+
+            self.log.debug("Instantiating OpenStack APIs...")
+            auth = keystone_identity.v3.Password(**dict(zip(KEYSTONE_CREDENTIALS, key)))
+            session = keystone_session.Session(auth=auth)
+            keystone = keystone_client.Client(session=session)
+            nova = nova_client.Client(NOVA_API_VERSION, session=session)
+            cinder = cinder_client.Client(CINDER_API_VERSION, session=session)
+            neutron = neutron_client.Client(session=session)
+            self.log.debug("OpenStack APIs successfully instantiated")
+
+            self.clients[key] = (keystone, nova, cinder, neutron)
+            return self.clients[key]
+
 
+
+    def forget_clients(self, config, error):
+        """
+        Drop the cached OpenStack APIs clients when the keystone authentication is rejected.
+        Next call to get_clients will authenticate again.
+
+        :param config: (gerenuk.Config) The configuration holding keystone credentials
+        :param error: (Exception) The error raised by the OpenStack APIs
+        """
         try:
-            # Project
-            project_id = ""
-            for project in keystone.projects.list():
-                if credentials["project_name"] == project.name:
+            import keystoneauth1.exceptions as keystone_exceptions
+        except Exception:
+            # No keystoneauth, no cached session
+            return
+
+        if isinstance(error, keystone_exceptions.Unauthorized):
+            self.log.info("Authentication rejected by keystone, dropping OpenStack session")
+            with self.clients_lock:
+                self.clients.pop(self.get_credentials(config), None)
+
+
+
+    def resolve_project_id(self, project_settings, keystone):
+        """
+        Resolve the ID of a monitored project.
+        The project scoped by the keystone token is used first, then cached IDs,
+        and the keystone projects are only listed as a last resort.
+
+        :param project_settings: (gerenuk.monitoring.settings.ProjectSettings) The project settings
+        :param keystone: (keystoneclient.client) The keystone client
+        :return: (str) The project ID ("" if unknown)
+        """
+        domain_name = project_settings.project_domain_name
+        project_name = project_settings.project_name
+
+        # Token scope
+        project_id = keystone.session.get_project_id()
+        if project_id:
+            return project_id
+
+        # Cache
+        project_id = self.project_ids.get(domain_name, project_name)
+        if project_id:
+            self.log.debug("Project ID of %s found in cache" % project_name)
+            return project_id
+
+        # Keystone projects listing (project names are only unique within a domain)
+        self.log.debug("Looking for project ID of %s in keystone..." % project_name)
+        project_id = ""
+        for domain in keystone.domains.list(name=domain_name):
+            for project in keystone.projects.list(name=project_name, domain=domain.id):
+                if project_name == project.name:
                     project_id = project.id
 
+        if project_id:
+            self.project_ids.set(domain_name, project_name, project_id)
+        return project_id
+
+
+
+    def fetch_project_inventory(self, project_id, nova, cinder, neutron):
+        """
+        List the resources of an openstack project through its own clients.
+        With change detection, only the servers changed since previous listing are asked to nova
+        (a full listing is still done every recheck interval).
+
+        :param project_id: (str) The ID of the project
+        :param nova: (novaclient.client) The nova client
+        :param cinder: (cinderclient.client) The cinder client
+        :param neutron: (neutronclient.v2_0.client) The neutron client
+        :return: (gerenuk.monitoring.inventory.ProjectInventory) The project inventory
+        """
+        page_size = self.config.get_int("openstack", "page_size")
+        if not self.change_detection:
+            return gerenuk.monitoring.inventory.fetch_project_inventory(project_id, nova, cinder, neutron, page_size)
+
+        # A margin covers clock skew between the daemon and nova
+        listing_time = datetime.datetime.utcnow() - datetime.timedelta(minutes=5)
+        (since, full_listing_time, previous_instances) = self.instances_cache.get(project_id, (None, None, None))
+
+        if full_listing_time is None or (listing_time - full_listing_time).total_seconds() > self.recheck_interval:
+            self.log.debug("Full listing of project %s servers" % project_id)
+            (since, full_listing_time, previous_instances) = (None, listing_time, None)
+
+        project_inventory = gerenuk.monitoring.inventory.fetch_project_inventory(
+            project_id, nova, cinder, neutron, page_size, previous_instances, since, stream=False
+        )
+        self.instances_cache[project_id] = (listing_time, full_listing_time, project_inventory.instances)
+        return project_inventory
+
+
+
+    def take_inventory(self):
+        """
+        Take an admin-scoped snapshot of the resources of all projects.
+        The main configuration keystone credentials are used.
+
+        :return: (gerenuk.monitoring.inventory.Inventory) The inventory snapshot
+        :raise: (gerenuk.DependencyError) When a required dependency is missing
+        :raise: (gerenuk.MonitoringError) When an internal error occurs
+        """
+        (keystone, nova, cinder, neutron) = self.get_clients(self.config)
+
+        try:
+            self.log.debug("Taking inventory snapshot...")
+            inventory = gerenuk.monitoring.inventory.Inventory.fetch(
+                keystone, nova, cinder, neutron, self.config.get_int("openstack", "page_size")
+            )
+            self.log.debug("Inventory snapshot of %d project(s) successfully taken" % len(inventory.buckets))
+            return inventory
+
+        except Exception as e:
+            self.forget_clients(self.config, e)
+            raise gerenuk.MonitoringError(e)
+
+
+            
+    def monitor_project(self, project_settings, project_inventory=None):
+        """
+        Monitor an openstack project.
+
+        :param project_settings: (gerenuk.monitoring.settings.ProjectSettings) The project settings
+        :param project_inventory: (gerenuk.monitoring.inventory.ProjectInventory) The project resources (None to list them)
+        :raise: (gerenuk.DependencyError) When a required dependency is missing
+        :raise: (gerenuk.MonitoringError) When an internal error occurs
+        """
+        # Dependencies
+        try:
+            import mysql.connector
+        except Exception as e:
+            raise gerenuk.DependencyError(e)
+
+        if project_inventory is None:
+            (keystone, nova, cinder, neutron) = self.get_clients(project_settings.config)
+
+        try:
+            if project_inventory is None:
+                # Project
+                project_id = self.resolve_project_id(project_settings, keystone)
+
+                # Resources
+                self.log.debug("Listing project resources...")
+                project_inventory = self.fetch_project_inventory(project_id, nova, cinder, neutron)
+
+            project_id = project_inventory.project_id
+
             # Unread alerts
-            sql = 'SELECT id, uuid, message FROM user_alerts WHERE status=1 AND project="%s";'
-            self.db_cursor.execute(sql % (project_id,))
-            unread_alerts = self.db_cursor.fetchall()
+            alerts = gerenuk.monitoring.alerts.ProjectAlerts(self.database, project_id, self.log, self.alerts_batch_size)
+
+            # Resources states
+            if self.change_detection:
+                states = gerenuk.monitoring.changes.ResourceStates(
+                    self.database, project_id, self.recheck_interval, project_settings.fingerprint
+                )
+            else:
+                states = gerenuk.monitoring.changes.AlwaysCheck()
 
             # Instances
-            self.monitor_instances(project_config, unread_alerts, project_id, nova)
+            self.monitor_instances(project_settings, alerts, project_id, project_inventory.instances, project_inventory.flavors, states)
 
             # Volumes
-            self.monitor_volumes(project_config, unread_alerts, project_id, cinder)
+            self.monitor_volumes(project_settings, alerts, project_id, project_inventory.volumes, states)
 
             # Networks
-            self.monitor_security_groups(project_config, unread_alerts, project_id, neutron)
+            self.monitor_security_groups(project_settings, alerts, project_id, project_inventory.security_groups, states)
+            alerts.flush()
+            states.save()
 
             # Cleaner
-            if project_config.get_bool("cleaner", "clean_read_alerts"):
-                lifespan = project_config.get_int("cleaner", "read_alerts_lifespan")
+            if project_settings.clean_read_alerts:
+                lifespan = project_settings.read_alerts_lifespan
                 timestamp = datetime.datetime.now() - datetime.timedelta(days=lifespan)
 
                 self.log.debug("Deleting read alerts older than %d days..." % (lifespan,))
-                sql = 'DELETE FROM user_alerts WHERE project="%s" AND status=0 AND timestamp<="%s";'
-                self.db_cursor.execute(sql % (project_id, timestamp))
-                deleted = self.db_cursor.rowcount
+                sql = 'DELETE FROM user_alerts WHERE project=%s AND status=0 AND timestamp<=%s;'
+                deleted = self.database.execute(sql, (project_id, timestamp)).rowcount
                 self.log.info("%d alert(s) cleaned" % (deleted,))
             else:
                 self.log.debug("clean_read_alerts option disabled by configuration")
@@ -225,32 +566,58 @@ class OpenstackMonitor():
             self.database.commit()
             self.log.debug("Database requests successfully commited")
 
+        except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+            # Connection with database lost, the project can be monitored again on a new connection
+            raise
+
         except Exception as e:
+            # Drop the partial writes of the project (the connection is reused by the next project of this worker)
+            try:
+                self.database.rollback()
+            except mysql.connector.Error:
+                pass
+
+            self.forget_clients(project_settings.config, e)
             raise gerenuk.MonitoringError(e)
 
 
 
-    def monitor_instances(self, project_config, unread_alerts, project_id, nova):
+    def monitor_instances(self, project_settings, alerts, project_id, instances, flavors, states):
         """
         Monitor instances of an openstack project
 
-        :param project_config: (gerenuk.Config) The project configuration
-        :param unread_alerts: (list) The unread alerts
+        :param project_settings: (gerenuk.monitoring.settings.ProjectSettings) The project settings
+        :param alerts: (gerenuk.monitoring.alerts.ProjectAlerts) The project alerts
         :param project_id: (str) The ID of monitored project
-        :param nova: (novaclient.client) The nova client
+        :param instances: (iterable) The project instances (gerenuk.monitoring.inventory.Instance), possibly streamed page by page
+        :param flavors: (dict) The vCPUs of each flavor, by flavor ID
+        :param states: (gerenuk.monitoring.changes.ResourceStates) The resources states of previous pass
         """
         now = datetime.date.today()
-        timestamp = datetime.datetime.now()
         instances_per_user = dict()
         vcpus_per_user = dict()
-        flavors = dict()
-        
-        self.log.debug("Getting flavor list...")
-        for flavor in nova.flavors.list():
-            flavors[flavor.id] = flavor.vcpus
         
         self.log.debug("Begining of instances monitoring...")
-        for instance in nova.servers.list():
+        for instance in instances:
+            # Count instances
+            if not instance.user_id in instances_per_user:
+                instances_per_user[instance.user_id] = 0
+            instances_per_user[instance.user_id] += 1
+
+            # Count vcpus
+            if not instance.user_id in vcpus_per_user:
+                vcpus_per_user[instance.user_id] = 0
+            if instance.flavor_id in flavors:
+                vcpus_per_user[instance.user_id] += flavors[instance.flavor_id]
+
+            # Filter
+            if instance.id in project_settings.instances_whitelist:
+                continue
+
+            # Unchanged since previous pass
+            if not states.check(instance.id, gerenuk.monitoring.changes.fingerprint(instance)):
+                continue
+
             date_format = "%Y-%m-%dT%H:%M:%SZ"
             created_at = datetime.datetime.strptime(instance.created, date_format)
             updated_at = datetime.datetime.strptime(instance.updated, date_format)
@@ -265,36 +632,10 @@ class OpenstackMonitor():
             if updated_delta < 2:
                 updated_delta_s = ''
 
-            # Count instances
-            if not instance.user_id in instances_per_user:
-                instances_per_user[instance.user_id] = 0
-            instances_per_user[instance.user_id] += 1
-
-            # Count vcpus
-            if not instance.user_id in vcpus_per_user:
-                vcpus_per_user[instance.user_id] = 0
-            if instance.flavor["id"] in flavors:
-                vcpus_per_user[instance.user_id] += flavors[instance.flavor["id"]]
-
-            # Filter
-            whitelist = project_config.get_list('instances', 'whitelist')
-            if instance.id in whitelist:
-                continue
-
             # Instances in error status
             if instance.status.upper() == "ERROR":
                 self.log.debug("Found instance %s in ERROR status" % instance.id)
 
-                # Look for matching unread alert
-                matching_alert = None
-                regex = re.compile("^Instance %s ([\(])?.*[\)\s]?created on [0-9]{2}/[0-9]{2}/[0-9]{4} \([0-9]+ day[s]? ago\) in error \(ERROR\) since [0-9]+ day[s]?\.$" % instance.id)
-                        
-                for alert in unread_alerts:
-                    (id, user_id, message) = alert
-                    if regex.match(message) and user_id == instance.user_id:
-                        matching_alert = alert
-                        break
-                            
                 # Define alert message
                 message = "Instance " + instance.id
                 if instance.name:
@@ -302,38 +643,17 @@ class OpenstackMonitor():
                 message += " created on " + created_at.strftime("%d/%m/%Y") + " (" + str(created_delta) + " day" + created_delta_s + " ago) in error ("
                 message += "ERROR) since " + str(updated_delta) + " day" + updated_delta_s + '.'
 
-                # Update or keep unchanged existing alerts
-                if matching_alert:
-                    if matching_alert[2] != message:
-                        self.log.info("The instance %s has matching unread alert in database. Updating old messages..." % instance.id)
-                        sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                        self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                        continue
-
-                    self.log.debug("The instance %s has matching unread alert in database. Up to date" % instance.id)
-                    continue
-
-                # Create new alert
-                self.log.info("Create alert for instance %s (in error)" % instance.id)
-                sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                self.db_cursor.execute(sql % (instance.user_id, instance.tenant_id, SEVERITY_WARNING, message, timestamp))
+                alerts.notify(
+                    gerenuk.monitoring.alerts.ALERT_INSTANCE_ERROR, instance.id, instance.user_id, instance.tenant_id,
+                    SEVERITY_WARNING, message, "instance %s" % instance.id, "in error"
+                )
 
-                
             # Instances in stopped status
             elif instance.status.upper() == "SHUTOFF":
-                if updated_delta >= project_config.get_int('instances', 'stopped_alert_delay'):
+                states.expect(instance.id, gerenuk.monitoring.changes.threshold_deadline(updated_at, project_settings.stopped_alert_delay))
+                if updated_delta >= project_settings.stopped_alert_delay:
                     self.log.debug("Found instance %s in SHUTOFF status since a while" % instance.id)
 
-                    # Look for matching unread alert
-                    matching_alert = None
-                    regex = re.compile("^Instance %s ([\(])?.*[\)\s]?created on [0-9]{2}/[0-9]{2}/[0-9]{4} \([0-9]+ day[s]? ago\) stopped \(SHUTOFF\) since [0-9]+ day[s]?\.$" % instance.id)
-                        
-                    for alert in unread_alerts:
-                        (id, user_id, message) = alert
-                        if regex.match(message) and user_id == instance.user_id:
-                            matching_alert = alert
-                            break
-                            
                     # Define alert message
                     message = "Instance " + instance.id
                     if instance.name:
@@ -341,38 +661,17 @@ class OpenstackMonitor():
                     message += " created on " + created_at.strftime("%d/%m/%Y") + " (" + str(created_delta) + " day" + created_delta_s + " ago) stopped ("
                     message += "SHUTOFF) since " + str(updated_delta) + " day" + updated_delta_s + '.'
 
-                    # Update or keep unchanged existing alerts
-                    if matching_alert:
-                        if matching_alert[2] != message:
-                            self.log.info("The instance %s has matching unread alert in database. Updating old messages..." % instance.id)
-                            sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                            self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                            continue
-
-                        self.log.debug("The instance %s has matching unread alert in database. Up to date" % instance.id)
-                        continue
-
-                    # Create new alert
-                    self.log.info("Create alert for instance %s (stopped since a while)" % instance.id)
-                    sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                    self.db_cursor.execute(sql % (instance.user_id, instance.tenant_id, SEVERITY_ALERT, message, timestamp))
+                    alerts.notify(
+                        gerenuk.monitoring.alerts.ALERT_INSTANCE_STOPPED, instance.id, instance.user_id, instance.tenant_id,
+                        SEVERITY_ALERT, message, "instance %s" % instance.id, "stopped since a while"
+                    )
 
-                    
             # Instances in running status
             elif instance.status.upper() == "ACTIVE":
-                if updated_delta >= project_config.get_int('instances', 'running_alert_delay'):
+                states.expect(instance.id, gerenuk.monitoring.changes.threshold_deadline(updated_at, project_settings.running_alert_delay))
+                if updated_delta >= project_settings.running_alert_delay:
                     self.log.debug("Found instance %s in ACTIVE status since a while" % instance.id)
 
-                    # Look for matching unread alert
-                    matching_alert = None
-                    regex = re.compile("^Instance %s ([\(])?.*[\)\s]?created on [0-9]{2}/[0-9]{2}/[0-9]{4} \([0-9]+ day[s]? ago\) running \(ACTIVE\) since a long time \([0-9]+ day[s]?\)\.$" % instance.id)
-                        
-                    for alert in unread_alerts:
-                        (id, user_id, message) = alert
-                        if regex.match(message) and user_id == instance.user_id:
-                            matching_alert = alert
-                            break
-                            
                     # Define alert message
                     message = "Instance " + instance.id
                     if instance.name:
@@ -380,108 +679,55 @@ class OpenstackMonitor():
                     message += " created on " + created_at.strftime("%d/%m/%Y") + " (" + str(created_delta) + " day" + created_delta_s + " ago) running ("
                     message += "ACTIVE) since a long time (" + str(updated_delta) + " day" + updated_delta_s + ")."
 
-                    # Update or keep unchanged existing alerts
-                    if matching_alert:
-                        if matching_alert[2] != message:
-                            self.log.info("The instance %s has matching unread alert in database. Updating old messages..." % instance.id)
-                            sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                            self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                            continue
-
-                        self.log.debug("The instance %s has matching unread alert in database. Up to date" % instance.id)
-                        continue
-
-                    # Create new alert
-                    self.log.info("Create alert for instance %s (active since a while)" % instance.id)
-                    sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                    self.db_cursor.execute(sql % (instance.user_id, instance.tenant_id, SEVERITY_INFO, message, timestamp))
+                    alerts.notify(
+                        gerenuk.monitoring.alerts.ALERT_INSTANCE_RUNNING, instance.id, instance.user_id, instance.tenant_id,
+                        SEVERITY_INFO, message, "instance %s" % instance.id, "active since a while"
+                    )
 
         # Instances per user
         for user in instances_per_user:
-            if instances_per_user[user] > project_config.get_int('instances', 'max_instances_per_user'):
+            if instances_per_user[user] > project_settings.max_instances_per_user:
                 self.log.debug("Max instances number reach for user %s" % user)
 
-                # Look for matching unread alert
-                matching_alert = None
-                regex = re.compile("^Too many instances \([0-9]+\) launched by user %s\.$" % user)
-                        
-                for alert in unread_alerts:
-                    (id, user_id, message) = alert
-                    if regex.match(message) and user_id == user:
-                        matching_alert = alert
-                        break
-                            
                 # Define alert message
                 message = "Too many instances (" + str(instances_per_user[user]) + ") launched by user %s." % user
 
-                # Update or keep unchanged existing alerts
-                if matching_alert:
-                    if matching_alert[2] != message:
-                        self.log.info("The user %s has matching unread alert in database. Updating old messages..." % user)
-                        sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                        self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                        continue
-
-                    self.log.debug("The user %s has matching unread alert in database. Up to date" % user)
-                    continue
-
-                # Create new alert
-                self.log.info("Create alert for user %s (too many instances)" % user)
-                sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                self.db_cursor.execute(sql % (user, project_id, SEVERITY_WARNING, message, timestamp))
+                alerts.notify(
+                    gerenuk.monitoring.alerts.ALERT_USER_INSTANCES, user, user, project_id,
+                    SEVERITY_WARNING, message, "user %s" % user, "too many instances"
+                )
 
         # vCPUs per user
         for user in vcpus_per_user:
-            if vcpus_per_user[user] > project_config.get_int('instances', 'max_vcpus_per_user'):
+            if vcpus_per_user[user] > project_settings.max_vcpus_per_user:
                 self.log.debug("Max vcpus number reach for user %s" % user)
 
-                # Look for matching unread alert
-                matching_alert = None
-                regex = re.compile("^Too many vCPUs \([0-9]+\) for user %s\.$" % user)
-                        
-                for alert in unread_alerts:
-                    (id, user_id, message) = alert
-                    if regex.match(message) and user_id == user:
-                        matching_alert = alert
-                        break
-                            
                 # Define alert message
                 message = "Too many vCPUs (" + str(vcpus_per_user[user]) + ") for user %s." % user
 
-                # Update or keep unchanged existing alerts
-                if matching_alert:
-                    if matching_alert[2] != message:
-                        self.log.info("The user %s has matching unread alert in database. Updating old messages..." % user)
-                        sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                        self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                        continue
-
-                    self.log.debug("The user %s has matching unread alert in database. Up to date" % user)
-                    continue
-
-                # Create new alert
-                self.log.info("Create alert for user %s (too many vCPUs)" % user)
-                sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                self.db_cursor.execute(sql % (user, project_id, SEVERITY_WARNING, message, timestamp))
+                alerts.notify(
+                    gerenuk.monitoring.alerts.ALERT_USER_VCPUS, user, user, project_id,
+                    SEVERITY_WARNING, message, "user %s" % user, "too many vCPUs"
+                )
 
 
 
-    def monitor_volumes(self, project_config, unread_alerts, project_id, cinder):
+    def monitor_volumes(self, project_settings, alerts, project_id, volumes, states):
         """
         Monitor volumes of an openstack project
 
-        :param project_config: (gerenuk.Config) The project configuration
-        :param unread_alerts: (list) The unread alerts
+        :param project_settings: (gerenuk.monitoring.settings.ProjectSettings) The project settings
+        :param alerts: (gerenuk.monitoring.alerts.ProjectAlerts) The project alerts
         :param project_id: (str) The ID of monitored project
-        :param cinder: (cinderclient.client) The cinder client
+        :param volumes: (iterable) The project volumes (gerenuk.monitoring.inventory.Volume), possibly streamed page by page
+        :param states: (gerenuk.monitoring.changes.ResourceStates) The resources states of previous pass
         """
         now = datetime.date.today()
-        timestamp = datetime.datetime.now()
         volumes_per_user = dict()
         storage_per_user = dict()
 
         self.log.debug("Begining of volumes monitoring...")
-        for volume in cinder.volumes.list():
+        for volume in volumes:
             # Count volumes
             if not volume.user_id in volumes_per_user:
                 volumes_per_user[volume.user_id] = 0
@@ -493,8 +739,11 @@ class OpenstackMonitor():
             storage_per_user[volume.user_id] += volume.size
 
             # Filter
-            whitelist = project_config.get_list('volumes', 'whitelist')
-            if volume.id in whitelist:
+            if volume.id in project_settings.volumes_whitelist:
+                continue
+
+            # Unchanged since previous pass
+            if not states.check(volume.id, gerenuk.monitoring.changes.fingerprint(volume)):
                 continue
                 
             date_format = "%Y-%m-%dT%H:%M:%S.%f"
@@ -514,16 +763,6 @@ class OpenstackMonitor():
             if volume.status.upper() in ("ERROR", "ERROR_DELETING"):
                 self.log.debug("Found volume %s in %s status" % (volume.id, volume.status.upper()))
 
-                # Look for matching unread alert
-                matching_alert = None
-                regex = re.compile("^Volume %s ([\(])?.*[\)\s]?created on [0-9]{2}/[0-9]{2}/[0-9]{4} \([0-9]+ day[s]? ago\) in error \(ERROR|ERROR_DELETING\) since [0-9]+ day[s]?\.$" % volume.id)
-                    
-                for alert in unread_alerts:
-                    (id, user_id, message) = alert
-                    if regex.match(message) and user_id == volume.user_id:
-                        matching_alert = alert
-                        break
-                        
                 # Define alert message
                 message = "Volume " + volume.id
                 if volume.name:
@@ -531,72 +770,32 @@ class OpenstackMonitor():
                     message += " created on " + created_at.strftime("%d/%m/%Y") + " (" + str(created_delta) + " day" + created_delta_s + "  ago) in error ("
                     message += volume.status.upper() + ") since " + str(updated_delta) + " day" + updated_delta_s + '.'
 
-                # Update or keep unchanged existing alerts
-                if matching_alert:
-                    if matching_alert[2] != message:
-                        self.log.info("The volume %s has matching unread alert in database. Updating old messages..." % volume.id)
-                        sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                        self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                        continue
-
-                    self.log.debug("The volume %s has matching unread alert in database. Up to date" % volume.id)
-                    continue
-
-                # Create new alert
-                self.log.info("Create alert for volume %s (in error)" % volume.id)
-                sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                self.db_cursor.execute(sql % (volume.user_id, getattr(volume, "os-vol-tenant-attr:tenant_id"), SEVERITY_WARNING, message, timestamp))
+                alerts.notify(
+                    gerenuk.monitoring.alerts.ALERT_VOLUME_ERROR, volume.id, volume.user_id, volume.tenant_id,
+                    SEVERITY_WARNING, message, "volume %s" % volume.id, "in error"
+                )
 
             elif volume.status.upper() == "AVAILABLE":
                 if not(volume.bootable) and not(volume.name):
-                    if updated_delta >= project_config.get_int('volumes', 'orphan_alert_delay'):
+                    states.expect(volume.id, gerenuk.monitoring.changes.threshold_deadline(updated_at, project_settings.orphan_alert_delay))
+                    if updated_delta >= project_settings.orphan_alert_delay:
                         self.log.debug("Found probably orphan volume %s" % volume.id)
 
-                        # Look for matching unread alert
-                        matching_alert = None
-                        regex = re.compile("^Volume %s created on [0-9]{2}/[0-9]{2}/[0-9]{4} \([0-9]+ day[s]? ago\) probably orphan \(AVAILABLE\) since [0-9]+ day[s]?\.$" % volume.id)
-                            
-                        for alert in unread_alerts:
-                            (id, user_id, message) = alert
-                            if regex.match(message) and user_id == volume.user_id:
-                                matching_alert = alert
-                                break
-                                
                         # Define alert message
                         message = "Volume " + volume.id
                         message += " created on " + created_at.strftime("%d/%m/%Y") + " (" + str(created_delta) + " day" + created_delta_s + " ago) probably orphan ("
                         message += "AVAILABLE) since " + str(updated_delta) + " day" + updated_delta_s + '.'
 
-                        # Update or keep unchanged existing alerts
-                        if matching_alert:
-                            if matching_alert[2] != message:
-                                self.log.info("The volume %s has matching unread alert in database. Updating old messages..." % volume.id)
-                                sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                                self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                                continue
-
-                            self.log.debug("The volume %s has matching unread alert in database. Up to date" % volume.id)
-                            continue
-
-                        # Create new alert
-                        self.log.info("Create alert for volume %s (probably orphan)" % volume.id)
-                        sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                        self.db_cursor.execute(sql % (volume.user_id, getattr(volume, "os-vol-tenant-attr:tenant_id"), SEVERITY_ALERT, message, timestamp))
+                        alerts.notify(
+                            gerenuk.monitoring.alerts.ALERT_VOLUME_ORPHAN, volume.id, volume.user_id, volume.tenant_id,
+                            SEVERITY_ALERT, message, "volume %s" % volume.id, "probably orphan"
+                        )
                             
                 else:
-                    if updated_delta >= project_config.get_int('volumes', 'inactive_alert_delay'):
+                    states.expect(volume.id, gerenuk.monitoring.changes.threshold_deadline(updated_at, project_settings.inactive_alert_delay))
+                    if updated_delta >= project_settings.inactive_alert_delay:
                         self.log.debug("Found volume %s inactive since a while" % volume.id)
 
-                        # Look for matching unread alert
-                        matching_alert = None
-                        regex = re.compile("^Volume %s ([\(])?.*[\)\s]?created on [0-9]{2}/[0-9]{2}/[0-9]{4} \([0-9]+ day[s]? ago\) inactive \(AVAILABLE\) since [0-9]+ day[s]?\.$" % volume.id)
-                            
-                        for alert in unread_alerts:
-                            (id, user_id, message) = alert
-                            if regex.match(message) and user_id == volume.user_id:
-                                matching_alert = alert
-                                break
-                                
                         # Define alert messages
                         message = "Volume " + volume.id
                         if volume.name:
@@ -604,118 +803,64 @@ class OpenstackMonitor():
                         message += " created on " + created_at.strftime("%d/%m/%Y") + " (" + str(created_delta) + " day" + created_delta_s + " ago) inactive ("
                         message += volume.status.upper() + ") since " + str(updated_delta) + " day" + updated_delta_s + '.'
 
-                        # Update or keep unchanged existing alerts
-                        if matching_alert:
-                            if matching_alert[2] != message:
-                                self.log.info("The volume %s has matching unread alert in database. Updating old messages..." % volume.id)
-                                sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                                self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                                continue
-
-                            self.log.debug("The volume %s has matching unread alert in database. Up to date" % volume.id)
-                            continue
-
-                        # Create new alert
-                        self.log.info("Create alert for volume %s (inactive since a while)" % volume.id)
-                        sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                        self.db_cursor.execute(sql % (volume.user_id, getattr(volume, "os-vol-tenant-attr:tenant_id"), SEVERITY_ALERT, message, timestamp))
+                        alerts.notify(
+                            gerenuk.monitoring.alerts.ALERT_VOLUME_INACTIVE, volume.id, volume.user_id, volume.tenant_id,
+                            SEVERITY_ALERT, message, "volume %s" % volume.id, "inactive since a while"
+                        )
 
         # Volumes per user
         for user in volumes_per_user:
-            if volumes_per_user[user] > project_config.get_int('volumes', 'max_volumes_per_user'):
+            if volumes_per_user[user] > project_settings.max_volumes_per_user:
                 self.log.debug("Max volumes number reach for user %s" % user)
 
-                # Look for matching unread alert
-                matching_alert = None
-                regex = re.compile("^Too many volumes \([0-9]+\) created by user %s\.$" % user)
-                        
-                for alert in unread_alerts:
-                    (id, user_id, message) = alert
-                    if regex.match(message) and user_id == user:
-                        matching_alert = alert
-                        break
-                            
                 # Define alert message
                 message = "Too many volumes (" + str(volumes_per_user[user]) + ") created by user %s." % user
 
-                # Update or keep unchanged existing alerts
-                if matching_alert:
-                    if matching_alert[2] != message:
-                        self.log.info("The user %s has matching unread alert in database. Updating old messages..." % user)
-                        sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                        self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                        continue
-
-                    self.log.debug("The user %s has matching unread alert in database. Up to date" % user)
-                    continue
-
-                # Create new alert
-                self.log.info("Create alert for user %s (too many volumes)" % user)
-                sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                self.db_cursor.execute(sql % (user, project_id, SEVERITY_WARNING, message, timestamp))
+                alerts.notify(
+                    gerenuk.monitoring.alerts.ALERT_USER_VOLUMES, user, user, project_id,
+                    SEVERITY_WARNING, message, "user %s" % user, "too many volumes"
+                )
 
         # Storage per user
         for user in storage_per_user:
-            if storage_per_user[user] > project_config.get_int('volumes', 'max_storage_per_user'):
+            if storage_per_user[user] > project_settings.max_storage_per_user:
                 self.log.debug("Max storage number reach for user %s" % user)
 
-                # Look for matching unread alert
-                matching_alert = None
-                regex = re.compile("^Too much storage \([0-9]+GB\) for user %s\.$" % user)
-                        
-                for alert in unread_alerts:
-                    (id, user_id, message) = alert
-                    if regex.match(message) and user_id == user:
-                        matching_alert = alert
-                        break
-                            
                 # Define alert message
                 message = "Too much storage (" + str(storage_per_user[user]) + "GB) for user %s." % user
 
-                # Update or keep unchanged existing alerts
-                if matching_alert:
-                    if matching_alert[2] != message:
-                        self.log.info("The user %s has matching unread alert in database. Updating old messages..." % user)
-                        sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                        self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                        continue
-
-                    self.log.debug("The user %s has matching unread alert in database. Up to date" % user)
-                    continue
-
-                # Create new alert
-                self.log.info("Create alert for user %s (too much storage)" % user)
-                sql = 'INSERT INTO user_alerts(uuid, project, severity, message, timestamp) VALUES("%s", "%s", "%d", "%s", "%s");'
-                self.db_cursor.execute(sql % (user, project_id, SEVERITY_WARNING, message, timestamp))
+                alerts.notify(
+                    gerenuk.monitoring.alerts.ALERT_USER_STORAGE, user, user, project_id,
+                    SEVERITY_WARNING, message, "user %s" % user, "too much storage"
+                )
 
 
 
-    def monitor_security_groups(self, project_config, unread_alerts, project_id, neutron):
+    def monitor_security_groups(self, project_settings, alerts, project_id, security_groups, states):
         """
         Monitor instances of an openstack project
 
-        :param project_config: (gerenuk.Config) The project configuration
-        :param unread_alerts: (list) The unread alerts
+        :param project_settings: (gerenuk.monitoring.settings.ProjectSettings) The project settings
+        :param alerts: (gerenuk.monitoring.alerts.ProjectAlerts) The project alerts
         :param project_id: (str) The ID of monitored project
-        :param neutron: (neutronclient.v2_0.client) The neutron client
+        :param security_groups: (list) The project security groups (neutron dicts)
+        :param states: (gerenuk.monitoring.changes.ResourceStates) The resources states of previous pass
         """
         now = datetime.date.today()
-        timestamp = datetime.datetime.now()
         
         self.log.debug("Begining of security groupes monitoring...")
-        for sg in neutron.list_security_groups()["security_groups"]:
-            if sg["project_id"] != project_id:
-                continue
-                
-            trusted_subnets = project_config.get_list("networks", "trusted_subnets")
-            tcp_whitelist = project_config.get_list("networks", "tcp_whitelist")
-            udp_whitelist = project_config.get_list("networks", "udp_whitelist")
-            allow_icmp_in_default_sg = project_config.get_bool("networks", "allow_icmp_in_default_sg")
+        for sg in security_groups:
+            rules = project_settings.rules
+            allow_icmp_in_default_sg = project_settings.allow_icmp_in_default_sg
 
             if not("security_group_rules" in sg):
                 continue
                 
             for rule in sg["security_group_rules"]:
+                # Unchanged since previous pass
+                if not states.check(rule["id"], gerenuk.monitoring.changes.fingerprint(sg["name"], rule)):
+                    continue
+
                 date_format = "%Y-%m-%dT%H:%M:%SZ"
                 created_at = datetime.datetime.strptime(rule["created_at"], date_format)
                 created_delta = (now - created_at.date()).days
@@ -741,46 +886,22 @@ class OpenstackMonitor():
                         
                         self.log.debug("Found user defined rule in default security group")
 
-                        # Look for matching unread alert
-                        matching_alert = None
-                        regex = re.compile("^User defined rules in default security group \(reminder\: it's forbidden\)\!$")
-                        for alert in unread_alerts:
-                            (id, user_id, message) = alert
-                            if regex.match(message):
-                                matching_alert = alert
-                                break
-                                
                         # Define alert message
                         message = "User defined rules in default security group (reminder: it's forbidden)!"
 
-                        # Update or keep unchanged existing alerts
-                        if matching_alert:
-                            self.log.debug("The default security group has matching unread alert in database. Up to date")
-                            continue
-
-                        # Create new alert
-                        self.log.info("Create alert for default security group (user defined rule)")
-                        sql = 'INSERT INTO user_alerts(project, severity, message, timestamp) VALUES("%s", "%d", "%s", "%s");'
-                        self.db_cursor.execute(sql % (rule["tenant_id"], SEVERITY_WARNING, message, timestamp))
+                        alerts.notify(
+                            gerenuk.monitoring.alerts.ALERT_SG_DEFAULT, "default", None, rule["tenant_id"],
+                            SEVERITY_WARNING, message, "default security group", "user defined rule"
+                        )
 
                         
-                # Ignore private IPs
-                remote = IPNetwork(rule["remote_ip_prefix"])
-                if remote.is_private():
-                    continue
-
-                
-                # Ignore whitelisted IPs
-                whitelisted = False
-                for subnet in trusted_subnets:
-                    if IPNetwork(subnet).__contains__(remote):
-                        whitelisted = True
-                if whitelisted:
+                # Ignore private and whitelisted IPs
+                if rules.is_ignored_remote(rule["remote_ip_prefix"]):
                     continue
 
                 
                 # Wildcards
-                if rule["remote_ip_prefix"] in ("0.0.0.0/0", "::/0"):
+                if rule["remote_ip_prefix"] in gerenuk.monitoring.rules.WILDCARD_PREFIXES:
                     # Filter
                     if allow_icmp_in_default_sg and rule['protocol'] == "icmp":
                         continue
@@ -789,168 +910,86 @@ class OpenstackMonitor():
 
                     all_ports = False
                     ports = "Ports " + str(rule['port_range_min']) + ':' + str(rule['port_range_max'])
+                    ports_id = str(rule['port_range_min']) + ':' + str(rule['port_range_max'])
                     if rule['port_range_min'] == rule['port_range_max']:
                         if rule['port_range_min'] == None:
                             all_ports = True
+                            ports_id = "all"
                         else:
-                            if rule["protocol"] == "tcp":
-                                if rule['port_range_min'] in tcp_whitelist:
-                                    continue
-                            elif rule["protocol"] == "udp":
-                                if rule['port_range_min'] in udp_whitelist:
-                                    continue
-                            else:
+                            if rules.is_whitelisted_port(rule["protocol"], rule['port_range_min']):
                                 continue
                                 
                             ports = "Port " + str(rule['port_range_min'])
+                            ports_id = str(rule['port_range_min'])
 
-                    # Look for matching unread alert
-                    matching_alert = None
-                    if all_ports:
-                        pattern = "^All ports \(%s\) open all over the Internet in security group .* \(%s\) since [0-9]+ day[s]?\!$" % (rule["protocol"], sg['id'])
-                    else:
-                        pattern = "^%s \(%s\) open all over the Internet in security group .* \(%s\) since [0-9]+ day[s]?\!$" % (ports, rule["protocol"], sg['id'])
-                    regex = re.compile(pattern)
-                        
-                    for alert in unread_alerts:
-                        (id, user_id, message) = alert
-                        if regex.match(message):
-                            matching_alert = alert
-                            break
-                            
                     # Define alert message
                     message = ports
                     if all_ports:
                         message = "All ports"
-                    message += " (" + rule["protocol"] + ") open all over the Internet in security group "
+                    message += " (" + str(rule["protocol"]) + ") open all over the Internet in security group "
                     message += sg['name'] + " (" + sg['id'] + ") since " + str(created_delta) + " day" + created_delta_s + '!'
-                        
-                    # Update or keep unchanged existing alerts
-                    if matching_alert:
-                        if matching_alert[2] != message:
-                            self.log.info("The security group %s has matching unread alert in database. Updating old messages..." % sg['id'])
-                            sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                            self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                            continue
 
-                        self.log.debug("The security group %s has matching unread alert in database. Up to date" % sg['id'])
-                        continue
-
-                    # Create new alert
-                    self.log.info("Create alert for security group %s (fully opened rule)" % sg['id'])
-                    sql = 'INSERT INTO user_alerts(project, severity, message, timestamp) VALUES("%s", "%d", "%s", "%s");'
-                    self.db_cursor.execute(sql % (rule["tenant_id"], SEVERITY_CRITICAL, message, timestamp))
+                    alerts.notify(
+                        gerenuk.monitoring.alerts.ALERT_SG_WORLD_OPEN,
+                        gerenuk.monitoring.alerts.security_group_rule_id(sg['id'], rule["protocol"], ports_id),
+                        None, rule["tenant_id"], SEVERITY_CRITICAL, message, "security group %s" % sg['id'], "fully opened rule"
+                    )
 
                     
                 # Ignore whitelisted ports
                 elif rule['port_range_min'] == rule['port_range_max']:
-                    if rule["protocol"] == "tcp":
-                        if rule['port_range_min'] in tcp_whitelist:
-                            continue
-                    elif rule["protocol"] == "udp":
-                        if rule['port_range_min'] in udp_whitelist:
-                            continue
-                    else:
+                    if rules.is_whitelisted_port(rule["protocol"], rule['port_range_min']):
                         continue
                             
                     self.log.debug("Found wide opened rule in security group %s" % sg['name'])
 
                     all_ports = False
                     ports = "Ports " + str(rule['port_range_min']) + ':' + str(rule['port_range_max'])
+                    ports_id = str(rule['port_range_min']) + ':' + str(rule['port_range_max'])
                     if rule['port_range_min'] == rule['port_range_max']:
                         if rule['port_range_min'] == None:
                             all_ports = True
+                            ports_id = "all"
                         else:
                             ports = "Port " + str(rule['port_range_min'])
+                            ports_id = str(rule['port_range_min'])
 
-                    # Look for matching unread alert
-                    matching_alert = None
-                    if all_ports:
-                        pattern = "^All ports \(%s\) open to %s in security group .* \(%s\) since [0-9]+ day[s]?\.$" % (rule["protocol"], rule["remote_ip_prefix"], sg['id'])
-                    else:
-                        pattern = "^%s \(%s\) open to %s in security group .* \(%s\) since [0-9]+ day[s]?\.$" % (ports, rule["protocol"], rule["remote_ip_prefix"], sg['id'])
-                    regex = re.compile(pattern)
-                    
-                    for alert in unread_alerts:
-                        (id, user_id, message) = alert
-                        if regex.match(message):
-                            matching_alert = alert
-                            break
-                            
                     # Define alert message
                     message = ports
                     if all_ports:
                         message = "All ports"
                     message += " (" + rule["protocol"] + ") open to " + rule["remote_ip_prefix"] + " in security group "
                     message += sg['name'] + " (" + sg['id'] + ") since " + str(created_delta) + " day" + created_delta_s + '.'
-                        
-                    # Update or keep unchanged existing alerts
-                    if matching_alert:
-                        if matching_alert[2] != message:
-                            self.log.info("The security group %s has matching unread alert in database. Updating old messages..." % sg['id'])
-                            sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                            self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                            continue
-
-                        self.log.debug("The security group %s has matching unread alert in database. Up to date" % sg['id'])
-                        continue
 
-                    # Create new alert
-                    self.log.info("Create alert for security group %s (wide opened rule)" % sg['id'])
-                    sql = 'INSERT INTO user_alerts(project, severity, message, timestamp) VALUES("%s", "%d", "%s", "%s");'
-                    self.db_cursor.execute(sql % (rule["tenant_id"], SEVERITY_ALERT, message, timestamp))
+                    alerts.notify(
+                        gerenuk.monitoring.alerts.ALERT_SG_WIDE_OPEN,
+                        gerenuk.monitoring.alerts.security_group_rule_id(sg['id'], rule["protocol"], ports_id, rule["remote_ip_prefix"]),
+                        None, rule["tenant_id"], SEVERITY_ALERT, message, "security group %s" % sg['id'], "wide opened rule"
+                    )
 
 
                 # Analyze the other cases
                 else:
-                    counter = 0
-                    if rule["protocol"] == "tcp":
-                        for port in range(rule['port_range_min'], rule['port_range_max'] + 1):
-                            if not(port in tcp_whitelist):
-                                counter += 1
-                    elif rule["protocol"] == "udp":
-                        for port in range(rule['port_range_min'], rule['port_range_max'] + 1):
-                            if not(port in udp_whitelist):
-                                counter += 1
-                    else:
+                    counter = rules.count_open_ports(rule["protocol"], rule['port_range_min'], rule['port_range_max'])
+                    if counter is None:
                         continue
 
                     self.log.debug("Found unknown opened rule in security group %s" % sg['name'])
 
-                    # Look for matching unread alert
-                    matching_alert = None
-                    regex = re.compile("^[0-9]+ port[s]? in range %s:%s \(%s\) open to %s in security group .* \(%s\) since [0-9]+ day[s]?\.$" % (
-                        str(rule['port_range_min']), str(rule['port_range_max']), rule["protocol"], rule["remote_ip_prefix"], sg['id'])
-                    )
-                    for alert in unread_alerts:
-                        (id, user_id, message) = alert
-                        if regex.match(message):
-                            matching_alert = alert
-                            break
-
                     # Define alert message
+                    ports_id = str(rule['port_range_min']) + ':' + str(rule['port_range_max'])
                     ports_en = str(counter) + " port"
                     if counter > 1:
                         ports_en += 's'
-                    ports_en += " in range " + str(rule['port_range_min']) + ':' + str(rule['port_range_max'])
+                    ports_en += " in range " + ports_id
                     message =  ports_en + " (" + rule["protocol"] + ") open to " + rule["remote_ip_prefix"] + " in security group "
                     message += sg['name'] + " (" + sg['id'] + ") since " + str(created_delta) + " day" + created_delta_s + '.'
-                        
-                    # Update or keep unchanged existing alerts
-                    if matching_alert:
-                        if matching_alert[2] != message:
-                            self.log.info("The security group %s has matching unread alert in database. Updating old messages..." % sg['id'])
-                            sql = 'UPDATE user_alerts SET message="%s", timestamp="%s" WHERE id="%d";'
-                            self.db_cursor.execute(sql % (message, timestamp, matching_alert[0]))
-                            continue
-
-                        self.log.debug("The security group %s has matching unread alert in database. Up to date" % sg['id'])
-                        continue
 
-                    # Create new alert
-                    self.log.info("Create alert for security group %s (unknown opened rule)" % sg['id'])
-                    sql = 'INSERT INTO user_alerts(project, severity, message, timestamp) VALUES("%s", "%d", "%s", "%s");'
-                    self.db_cursor.execute(sql % (rule["tenant_id"], SEVERITY_ALERT, message, timestamp))
+                    alerts.notify(
+                        gerenuk.monitoring.alerts.ALERT_SG_RANGE_OPEN,
+                        gerenuk.monitoring.alerts.security_group_rule_id(sg['id'], rule["protocol"], ports_id, rule["remote_ip_prefix"]),
+                        None, rule["tenant_id"], SEVERITY_ALERT, message, "security group %s" % sg['id'], "unknown opened rule"
+                    )
 
 
 
@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sat Oct 17 05:21:07 PM CEST 2026
+
+import threading
+import logging
+import json
+import time
+import os
+
+
+class ProjectIdCache():
+    """
+    This class is used to cache the resolution of project names into project IDs.
+    """
+
+    def __init__(self, ttl, cache_file=None, log=None):
+        """
+        Initialize the ProjectIdCache object.
+        The cache file is loaded if it exists.
+
+        :param ttl: (int) The lifespan of cached project IDs (in seconds)
+        :param cache_file: (str) The file used to persist cached project IDs (None to keep them in memory only)
+        :param log: (logging.Logger) The logger to use
+        """
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self.log = log if log is not None else logging.getLogger("gerenuk-projectcache")
+        self.lock = threading.Lock()
+        self.project_ids = self.read()
+
+
+
+    def read(self):
+        """
+        Read the unexpired project IDs of the cache file.
+        An unreadable or corrupt cache file is ignored.
+
+        :return: (dict) The cached (project ID, expiration) tuples, by (domain name, project name)
+        """
+        project_ids = dict()
+        if not self.cache_file or not os.path.isfile(self.cache_file):
+            return project_ids
+
+        now = time.time()
+        try:
+            with open(self.cache_file, 'r') as fd:
+                for (domain_name, project_name, project_id, expiration) in json.load(fd):
+                    if expiration >= now:
+                        project_ids[(domain_name, project_name)] = (project_id, expiration)
+        except (OSError, ValueError, TypeError) as e:
+            self.log.warning("Ignoring project IDs cache file %s: %s" % (self.cache_file, repr(e)))
+            return dict()
+
+        return project_ids
+
+
+
+    def get(self, domain_name, project_name):
+        """
+        Give a cached project ID.
+
+        :param domain_name: (str) The project domain name
+        :param project_name: (str) The project name
+        :return: (str) The project ID (None if unknown or expired)
+        """
+        with self.lock:
+            cached = self.project_ids.get((domain_name, project_name))
+
+        if cached is None or cached[1] < time.time():
+            return None
+        return cached[0]
+
+
+
+    def set(self, domain_name, project_name, project_id):
+        """
+        Cache a project ID, and persist the cache if needed.
+        The project ID is kept in memory when the cache file can't be written.
+
+        :param domain_name: (str) The project domain name
+        :param project_name: (str) The project name
+        :param project_id: (str) The project ID
+        """
+        with self.lock:
+            now = time.time()
+            self.project_ids[(domain_name, project_name)] = (project_id, now + self.ttl)
+
+            if self.cache_file:
+                # Merge the entries written by other worker processes, keeping the latest ones
+                for (key, cached) in self.read().items():
+                    if not key in self.project_ids or self.project_ids[key][1] < cached[1]:
+                        self.project_ids[key] = cached
+
+            # Drop expired entries
+            for key in [key for (key, cached) in self.project_ids.items() if cached[1] < now]:
+                del self.project_ids[key]
+
+            if self.cache_file:
+                data = [key + value for (key, value) in self.project_ids.items()]
+
+                # Atomic replacement (the cache file may be shared by worker processes)
+                tmp_file = "%s.%d" % (self.cache_file, os.getpid())
+                try:
+                    with open(tmp_file, 'w') as fd:
+                        json.dump(data, fd)
+                    os.replace(tmp_file, self.cache_file)
+                except OSError as e:
+                    self.log.warning("Unable to write project IDs cache file %s: %s" % (self.cache_file, repr(e)))
+                    try:
+                        os.remove(tmp_file)
+                    except OSError:
+                        pass
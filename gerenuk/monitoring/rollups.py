@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sat Oct 17 11:48:05 PM CEST 2026
+
+import datetime
+
+
+# Rollups in execution order: (source period, target period, interval between two rollups)
+ROLLUPS = [
+    ("hourly", "daily", datetime.timedelta(hours=1)),
+    ("daily", "weekly", datetime.timedelta(days=1)),
+]
+
+
+
+def last_boundary(moment, interval):
+    """
+    Give the last rollup boundary before a given time (the start of current hour or day).
+
+    :param moment: (datetime.datetime) The time
+    :param interval: (datetime.timedelta) The interval between two rollups (one hour or one day)
+    :return: (datetime.datetime) The last boundary
+    """
+    boundary = moment.replace(minute=0, second=0, microsecond=0)
+    if interval >= datetime.timedelta(days=1):
+        boundary = boundary.replace(hour=0)
+    return boundary
+
+
+
+class RollupScheduler():
+    """
+    This class is used to run each rollup exactly once per boundary, whenever the monitoring passes happen.
+    The last rollup boundary of each target period is persisted with the stats of the hypervisor.
+    """
+
+    def __init__(self, database, hypervisor):
+        """
+        Initialize the RollupScheduler object.
+        The last rollups of the hypervisor are loaded.
+
+        :param database: (gerenuk.database.Database) The database
+        :param hypervisor: (str) The hypervisor hostname
+        """
+        self.database = database
+        self.hypervisor = hypervisor
+        self.last_rollups = dict()
+
+        sql = 'SELECT period, last_rollup FROM rollups_state WHERE hypervisor=%s;'
+        for (period, last_rollup) in self.database.fetchall(sql, (hypervisor,)):
+            self.last_rollups[period] = last_rollup
+
+
+
+    def due(self, now):
+        """
+        Give the rollups to run, and record them as done.
+        A rollup crossing several boundaries (e.g. after a downtime) is run once.
+        The first pass of a new hypervisor only records the boundaries.
+
+        :param now: (datetime.datetime) The current time
+        :return: (list) The (source period, target period, number of missed boundaries) tuples
+        """
+        rollups = list()
+
+        for (source, target, interval) in ROLLUPS:
+            boundary = last_boundary(now, interval)
+            last_rollup = self.last_rollups.get(target)
+
+            if last_rollup is not None and boundary > last_rollup:
+                rollups.append((source, target, (boundary - last_rollup) // interval - 1))
+
+            if last_rollup is None or boundary > last_rollup:
+                self.last_rollups[target] = boundary
+
+        return rollups
+
+
+
+    def save(self):
+        """
+        Save the last rollups (to be commited with the rolled up stats).
+        All periods are written, so a failed transaction is caught up by the next one.
+        """
+        sql =  'INSERT INTO rollups_state (hypervisor, period, last_rollup) VALUES (%s, %s, %s) '
+        sql += 'ON DUPLICATE KEY UPDATE last_rollup=VALUES(last_rollup);'
+        self.database.executemany(sql, [(self.hypervisor, period, last_rollup) for (period, last_rollup) in self.last_rollups.items()])
@@ -0,0 +1,183 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sat Oct 17 07:12:58 PM CEST 2026
+
+from netaddr import IPNetwork, IPSet
+import bisect
+
+
+# Private, shared and link-local networks (never reachable from the Internet)
+PRIVATE_NETWORKS = IPSet([
+    "10.0.0.0/8",
+    "100.64.0.0/10",
+    "169.254.0.0/16",
+    "172.16.0.0/12",
+    "192.0.0.0/24",
+    "192.168.0.0/16",
+    "198.18.0.0/15",
+    "239.0.0.0/8",
+    "fc00::/7",
+    "fe80::/10",
+    "fec0::/10",
+])
+
+# Remote IP prefixes matching the whole Internet
+WILDCARD_PREFIXES = ("0.0.0.0/0", "::/0")
+
+
+
+class PortSet():
+    """
+    This class is used to store a set of ports as sorted and merged intervals.
+    """
+
+    def __init__(self, ports):
+        """
+        Initialize the PortSet object.
+
+        :param ports: (list) The ports (int) or ports ranges (tuple of two int)
+        """
+        intervals = list()
+        for port in ports:
+            if isinstance(port, (tuple, list)):
+                intervals.append((int(port[0]), int(port[1])))
+            else:
+                intervals.append((int(port), int(port)))
+        intervals.sort()
+
+        # Merge overlapping and adjacent intervals
+        self.starts = list()
+        self.ends = list()
+        for (start, end) in intervals:
+            if self.ends and start <= self.ends[-1] + 1:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+
+
+    def __contains__(self, port):
+        """
+        Check if a port is in the set.
+
+        :param port: (int) The port
+        :return: (bool) True if the port is in the set
+        """
+        if port is None:
+            return False
+        index = bisect.bisect_right(self.starts, port) - 1
+        return index >= 0 and port <= self.ends[index]
+
+
+
+    def count(self, low, high):
+        """
+        Count the ports of the set in a range.
+
+        :param low: (int) The first port of the range
+        :param high: (int) The last port of the range
+        :return: (int) The number of ports of the range in the set
+        """
+        counter = 0
+        index = max(bisect.bisect_right(self.starts, low) - 1, 0)
+        while index < len(self.starts) and self.starts[index] <= high:
+            overlap = min(high, self.ends[index]) - max(low, self.starts[index]) + 1
+            if overlap > 0:
+                counter += overlap
+            index += 1
+        return counter
+
+
+
+    def count_outside(self, low, high):
+        """
+        Count the ports of a range which are not in the set.
+
+        :param low: (int) The first port of the range
+        :param high: (int) The last port of the range
+        :return: (int) The number of ports of the range out of the set
+        """
+        return high - low + 1 - self.count(low, high)
+
+
+
+class RuleEvaluator():
+    """
+    This class is used to evaluate security group rules against the settings of a project.
+    """
+
+    def __init__(self, trusted_subnets, tcp_whitelist, udp_whitelist):
+        """
+        Initialize the RuleEvaluator object.
+
+        :param trusted_subnets: (netaddr.IPSet) The trusted subnets
+        :param tcp_whitelist: (PortSet) The allowed TCP ports
+        :param udp_whitelist: (PortSet) The allowed UDP ports
+        """
+        self.ignored_remotes = PRIVATE_NETWORKS | trusted_subnets
+        self.whitelists = {"tcp": tcp_whitelist, "udp": udp_whitelist}
+        self.remotes = dict()
+
+
+
+    def is_ignored_remote(self, remote_ip_prefix):
+        """
+        Check if a remote IP prefix is private or trusted.
+
+        :param remote_ip_prefix: (str) The remote IP prefix of the rule
+        :return: (bool) True if the remote is private or trusted
+        """
+        ignored = self.remotes.get(remote_ip_prefix)
+        if ignored is None:
+            ignored = IPNetwork(remote_ip_prefix) in self.ignored_remotes
+            self.remotes[remote_ip_prefix] = ignored
+        return ignored
+
+
+
+    def is_whitelisted_port(self, protocol, port):
+        """
+        Check if a single port rule is allowed.
+        Rules on other protocols than TCP and UDP are always allowed.
+
+        :param protocol: (str) The rule protocol
+        :param port: (int) The rule port
+        :return: (bool) True if the port is allowed
+        """
+        whitelist = self.whitelists.get(protocol)
+        return whitelist is None or port in whitelist
+
+
+
+    def count_open_ports(self, protocol, low, high):
+        """
+        Count the not allowed ports of a ports range rule.
+
+        :param protocol: (str) The rule protocol
+        :param low: (int) The first port of the rule
+        :param high: (int) The last port of the rule
+        :return: (int) The number of not allowed ports (None for other protocols than TCP and UDP)
+        """
+        whitelist = self.whitelists.get(protocol)
+        if whitelist is None:
+            return None
+        return whitelist.count_outside(low, high)
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sat Oct 17 06:03:44 PM CEST 2026
+
+from netaddr import IPSet
+import collections
+import threading
+import gerenuk
+import gerenuk.monitoring.changes
+import gerenuk.monitoring.rules
+import os
+
+
+# Compiled settings of a monitored project (immutable)
+ProjectSettings = collections.namedtuple("ProjectSettings", [
+    "config",
+    "fingerprint",
+    "project_domain_name",
+    "project_name",
+    "instances_whitelist",
+    "stopped_alert_delay",
+    "running_alert_delay",
+    "max_instances_per_user",
+    "max_vcpus_per_user",
+    "volumes_whitelist",
+    "orphan_alert_delay",
+    "inactive_alert_delay",
+    "max_volumes_per_user",
+    "max_storage_per_user",
+    "trusted_subnets",
+    "tcp_whitelist",
+    "udp_whitelist",
+    "allow_icmp_in_default_sg",
+    "rules",
+    "clean_read_alerts",
+    "read_alerts_lifespan",
+])
+
+
+
+def compile_project_settings(config):
+    """
+    Convert the options of a project configuration once for all.
+    Whitelists become frozensets (or port intervals), trusted subnets an IPSet.
+
+    :param config: (gerenuk.Config) The project configuration
+    :return: (ProjectSettings) The project settings
+    :raise: (gerenuk.ConfigError) When an option is invalid
+    """
+    try:
+        trusted_subnets = IPSet(config.get_list("networks", "trusted_subnets"))
+        tcp_whitelist = gerenuk.monitoring.rules.PortSet(config.get_list("networks", "tcp_whitelist"))
+        udp_whitelist = gerenuk.monitoring.rules.PortSet(config.get_list("networks", "udp_whitelist"))
+
+        return ProjectSettings(
+            config=config,
+            fingerprint=gerenuk.monitoring.changes.fingerprint(
+                [(section, sorted(config.config.items(section))) for section in sorted(config.config.sections())]
+            ),
+            project_domain_name=config.get("keystone_authtoken", "project_domain_name"),
+            project_name=config.get("keystone_authtoken", "project_name"),
+            instances_whitelist=frozenset(config.get_list("instances", "whitelist")),
+            stopped_alert_delay=config.get_int("instances", "stopped_alert_delay"),
+            running_alert_delay=config.get_int("instances", "running_alert_delay"),
+            max_instances_per_user=config.get_int("instances", "max_instances_per_user"),
+            max_vcpus_per_user=config.get_int("instances", "max_vcpus_per_user"),
+            volumes_whitelist=frozenset(config.get_list("volumes", "whitelist")),
+            orphan_alert_delay=config.get_int("volumes", "orphan_alert_delay"),
+            inactive_alert_delay=config.get_int("volumes", "inactive_alert_delay"),
+            max_volumes_per_user=config.get_int("volumes", "max_volumes_per_user"),
+            max_storage_per_user=config.get_int("volumes", "max_storage_per_user"),
+            trusted_subnets=trusted_subnets,
+            tcp_whitelist=tcp_whitelist,
+            udp_whitelist=udp_whitelist,
+            allow_icmp_in_default_sg=config.get_bool("networks", "allow_icmp_in_default_sg"),
+            rules=gerenuk.monitoring.rules.RuleEvaluator(trusted_subnets, tcp_whitelist, udp_whitelist),
+            clean_read_alerts=config.get_bool("cleaner", "clean_read_alerts"),
+            read_alerts_lifespan=config.get_int("cleaner", "read_alerts_lifespan"),
+        )
+    except gerenuk.ConfigError:
+        raise
+    except Exception as e:
+        raise gerenuk.ConfigError("invalid project configuration: %s" % str(e))
+
+
+
+class ProjectSettingsCache():
+    """
+    This class is used to cache the compiled settings of monitored projects.
+    A configuration file is parsed again only when its modification time or size changed.
+    """
+
+    def __init__(self):
+        """
+        Initialize the ProjectSettingsCache object.
+        """
+        self.lock = threading.Lock()
+        self.settings = dict()
+
+
+
+    def get(self, config_file):
+        """
+        Give the compiled settings of a project configuration file.
+
+        :param config_file: (str) The project configuration file
+        :return: (ProjectSettings) The project settings
+        :raise: (gerenuk.ConfigError) When the configuration file is missing or invalid
+        """
+        try:
+            stat = os.stat(config_file)
+        except OSError:
+            raise gerenuk.ConfigError("configuration file " + config_file + " not found")
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            cached = self.settings.get(config_file)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        config = gerenuk.Config()
+        config.load(config_file)
+        settings = compile_project_settings(config)
+
+        with self.lock:
+            self.settings[config_file] = (version, settings)
+        return settings
+
+
+
+    def forget(self, config_files):
+        """
+        Drop the settings of configuration files that are not monitored anymore.
+
+        :param config_files: (list) The configuration files still monitored
+        """
+        with self.lock:
+            for config_file in set(self.settings) - set(config_files):
+                del self.settings[config_file]
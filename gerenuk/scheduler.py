@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sun Oct 18 12:37:52 AM CEST 2026
+
+import gerenuk
+import logging
+import random
+import signal
+import time
+
+
+# What to do with the passes missed while a pass overruns
+OVERRUN_POLICIES = ("skip", "catchup", "immediate")
+
+# The maximum time between two checks of the stop flag (in seconds)
+STOP_POLL_INTERVAL = 1.0
+
+
+
+class Scheduler():
+    """
+    This class is used to run the passes of a daemon at a fixed rate, using a monotonic clock.
+    Passes are scheduled at start + n * frequency, so their cadence does not drift with their duration.
+    """
+
+    def __init__(self, frequency, overrun_policy="skip", jitter=0, log=None):
+        """
+        Initialize the Scheduler object.
+
+        :param frequency: (int) The time between two passes (in seconds)
+        :param overrun_policy: (str) The overrun policy (see OVERRUN_POLICIES):
+                               skip runs the next pass at the next slot of the cadence,
+                               catchup runs the missed passes back to back,
+                               immediate runs the next pass right away and restarts the cadence from it
+        :param jitter: (int) The maximum random delay added to each pass (in seconds)
+        :param log: (logging.Logger) The logger to use
+        :raise: (gerenuk.ConfigError) When the frequency, the overrun policy or the jitter is invalid
+        """
+        if frequency <= 0:
+            raise gerenuk.ConfigError("invalid monitoring frequency %s" % str(frequency))
+
+        if jitter < 0 or jitter >= frequency:
+            raise gerenuk.ConfigError("invalid scheduling jitter %s (expected between 0 and the frequency)" % str(jitter))
+
+        if not overrun_policy in OVERRUN_POLICIES:
+            raise gerenuk.ConfigError("unknown overrun policy " + overrun_policy)
+
+        self.frequency = frequency
+        self.overrun_policy = overrun_policy
+        self.jitter = jitter
+        self.log = log if log is not None else logging.getLogger("gerenuk-scheduler")
+        self.stopped = False
+
+
+
+    def stop(self, signum=None, frame=None):
+        """
+        Ask the scheduler to stop once the current pass is done (usable as a signal handler).
+        Only a flag is set: locks (including the logging ones) may be held by the interrupted thread.
+
+        :param signum: (int) The received signal
+        :param frame: (frame) The interrupted frame
+        """
+        self.stopped = True
+
+
+
+    def handle_signals(self, signums=(signal.SIGTERM, signal.SIGINT)):
+        """
+        Stop the scheduler cleanly on termination signals.
+
+        :param signums: (tuple) The signals to handle
+        """
+        for signum in signums:
+            signal.signal(signum, self.stop)
+
+
+
+    def wait(self, deadline):
+        """
+        Wait until a monotonic deadline, or until the scheduler is stopped.
+        The stop flag is polled with bounded sleeps.
+
+        :param deadline: (float) The monotonic deadline
+        :return: (bool) True if the deadline was reached, False if the scheduler was stopped
+        """
+        while not self.stopped:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            time.sleep(min(remaining, STOP_POLL_INTERVAL))
+
+        self.log.info("Scheduler stopped")
+        return False
+
+
+
+    def run(self, function, *args, **kwargs):
+        """
+        Run a function at a fixed rate, until the scheduler is stopped.
+
+        :param function: (function) The pass to run
+        :param args: (list) The positional arguments of function
+        :param kwargs: (dict) The keyword arguments of function
+        """
+        next_run = time.monotonic()
+
+        while self.wait(next_run + random.uniform(0, self.jitter)):
+            function(*args, **kwargs)
+
+            next_run += self.frequency
+            now = time.monotonic()
+            if now <= next_run:
+                continue
+
+            # Overrun
+            missed = int((now - next_run) // self.frequency) + 1
+            duration = now - next_run + self.frequency
+            if self.overrun_policy == "skip":
+                self.log.warning("Pass lasted %.1fs, %d pass(es) skipped" % (duration, missed))
+                next_run += missed * self.frequency
+            elif self.overrun_policy == "catchup":
+                self.log.warning("Pass lasted %.1fs, catching up %d pass(es)" % (duration, missed))
+            else:
+                self.log.warning("Pass lasted %.1fs, running next pass now" % (duration,))
+                next_run = now
@@ -0,0 +1,487 @@
+#!/usr/bin/python3
+#
+#
+# This file is part of Gerenuk.
+#
+# Gerenuk is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gerenuk is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gerenuk. If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Cyrille TOULET <cyrille.toulet@univ-lille.fr>
+# Sat Oct 17 10:12:31 AM CEST 2026
+
+import gerenuk
+import struct
+import array
+import math
+import sys
+
+
+# Series are stored as packed little-endian float32 values
+SERIES_ITEM_FORMAT = "<f"
+SERIES_ITEM_SIZE = struct.calcsize(SERIES_ITEM_FORMAT)
+
+# Aggregates stored alongside each series (e.g. hourly_vcpu_avg)
+SERIES_AGGREGATES = ["avg", "min", "max", "p95"]
+AGGREGATE_COLUMNS = list()
+for metric in ["vcpu", "cpu", "mem"]:
+    for period in ["hourly", "daily", "weekly"]:
+        for aggregate in SERIES_AGGREGATES:
+            AGGREGATE_COLUMNS.append("%s_%s_%s" % (period, metric, aggregate))
+
+
+
+def pack_series(values):
+    """
+    Pack a time series to store it in a BLOB column.
+
+    :param values: (list) The series values
+    :return: (bytes) The packed series
+    """
+    return struct.pack("<%df" % len(values), *values)
+
+
+
+def unpack_series(data):
+    """
+    Unpack a time series stored in a BLOB column.
+
+    :param data: (bytes) The packed series
+    :return: (list) The series values
+    """
+    if not data:
+        return list()
+
+    return list(struct.unpack("<%df" % (len(data) // SERIES_ITEM_SIZE), bytes(data)))
+
+
+
+def is_legacy_series(data):
+    """
+    Check if a stored series is a comma-joined string (gerenuk < 2.1) instead of packed float32 values.
+
+    :param data: (bytes) The stored series
+    :return: (bool) True if the series is a comma-joined string
+    """
+    if not data:
+        return False
+
+    return len(bytes(data).strip(b"0123456789.,-eE")) == 0 and any(c in b"0123456789" for c in bytes(data))
+
+
+
+def parse_legacy_series(text):
+    """
+    Parse a time series stored as a comma-joined string (gerenuk < 2.1).
+
+    :param text: (str) The comma-joined series (bytes are accepted)
+    :return: (list) The series values
+    """
+    if isinstance(text, (bytes, bytearray)):
+        text = bytes(text).decode("ascii")
+    return [float(n) for n in text.split(',') if len(n) > 0]
+
+
+
+def percentile(sorted_values, rank):
+    """
+    Compute a percentile of a sorted series (nearest-rank method).
+
+    :param sorted_values: (list) The sorted series values
+    :param rank: (int) The percentile rank (between 1 and 100)
+    :return: (float) The percentile (None for an empty series)
+    """
+    if len(sorted_values) == 0:
+        return None
+
+    return sorted_values[max(int(math.ceil(rank / 100. * len(sorted_values))) - 1, 0)]
+
+
+
+def summarize_series(values, total=None):
+    """
+    Compute the aggregates of a time series (see SERIES_AGGREGATES).
+
+    :param values: (list) The series values
+    :param total: (float) The running sum of values, if maintained by caller
+    :return: (tuple) The average, min, max and 95th percentile (None for an empty series)
+    """
+    if len(values) == 0:
+        return (None, None, None, None)
+
+    if total is None:
+        total = sum(values)
+
+    sorted_values = sorted(values)
+    return (total / len(values), sorted_values[0], sorted_values[-1], percentile(sorted_values, 95))
+
+
+
+class SeriesBuffer():
+    """
+    This class is used to store a time series in a fixed-capacity ring buffer of float32 values.
+    Appends and rotations do not allocate memory, and the sum of values is maintained.
+    """
+
+    __slots__ = ("capacity", "data", "start", "length", "total")
+
+    def __init__(self, capacity):
+        """
+        Initialize the SeriesBuffer object.
+
+        :param capacity: (int) The maximum number of values
+        """
+        self.capacity = capacity
+        self.data = array.array("f", bytes(capacity * SERIES_ITEM_SIZE))
+        self.start = 0
+        self.length = 0
+        self.total = 0.
+
+
+
+    def __len__(self):
+        """
+        Give the number of values of the series.
+
+        :return: (int) The number of values
+        """
+        return self.length
+
+
+
+    def append(self, value):
+        """
+        Append a value to the series, dropping the oldest value when the buffer is full.
+
+        :param value: (float) The value to append
+        :return: (float) The dropped value (None if the buffer was not full)
+        """
+        if self.capacity == 0:
+            return None
+
+        dropped = None
+        index = (self.start + self.length) % self.capacity
+
+        if self.length == self.capacity:
+            dropped = self.data[self.start]
+            self.total -= dropped
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.length += 1
+
+        self.data[index] = value
+        self.total += self.data[index]
+        return dropped
+
+
+
+    def merge_before(self, values):
+        """
+        Merge older values before the values of the series (only the most recent values are kept).
+
+        :param values: (list) The older values
+        """
+        merged = list(values) + self.values()
+        self.start = 0
+        self.length = 0
+        self.total = 0.
+        for value in merged[max(len(merged) - self.capacity, 0):]:
+            self.append(value)
+
+
+
+    def chronological(self):
+        """
+        Give the values of the series, from the oldest to the most recent one.
+
+        :return: (array.array) The float32 values
+        """
+        end = self.start + self.length
+        if end <= self.capacity:
+            return self.data[self.start:end]
+        return self.data[self.start:] + self.data[:end - self.capacity]
+
+
+
+    def values(self):
+        """
+        Give the values of the series, from the oldest to the most recent one.
+
+        :return: (list) The values
+        """
+        return self.chronological().tolist()
+
+
+
+    def average(self):
+        """
+        Give the average of the series from its maintained sum.
+
+        :return: (float) The average (0 for an empty series)
+        """
+        if self.length == 0:
+            return 0.
+        return self.total / self.length
+
+
+
+    def pack(self):
+        """
+        Pack the series to store it in a BLOB column (see pack_series).
+
+        :return: (bytes) The packed series
+        """
+        values = self.chronological()
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values.tobytes()
+
+
+
+class SeriesMatrix():
+    """
+    This class is used to store a time series of many instances in a NumPy matrix (instances x values).
+    Each row is a ring buffer, and unused cells are NaN, so averages of many rows are computed at once.
+    """
+
+    def __init__(self, capacity):
+        """
+        Initialize the SeriesMatrix object.
+
+        :param capacity: (int) The maximum number of values of each series
+        :raise: (gerenuk.DependencyError) When numpy is missing
+        """
+        try:
+            import numpy
+        except Exception as e:
+            raise gerenuk.DependencyError(e)
+
+        self.numpy = numpy
+        self.capacity = capacity
+        self.rows = 0
+        self.data = numpy.full((16, capacity), numpy.nan, dtype=numpy.float32)
+        self.start = numpy.zeros(16, dtype=numpy.int64)
+        self.length = numpy.zeros(16, dtype=numpy.int64)
+
+
+
+    def add_row(self):
+        """
+        Allocate the row of a new series (the matrix is doubled when full).
+
+        :return: (SeriesMatrixRow) The new series
+        """
+        if self.rows == len(self.data):
+            size = 2 * len(self.data)
+            self.data = self.numpy.vstack([self.data, self.numpy.full((size - len(self.data), self.capacity), self.numpy.nan, dtype=self.numpy.float32)])
+            self.start = self.numpy.concatenate([self.start, self.numpy.zeros(size - len(self.start), dtype=self.numpy.int64)])
+            self.length = self.numpy.concatenate([self.length, self.numpy.zeros(size - len(self.length), dtype=self.numpy.int64)])
+
+        self.rows += 1
+        return SeriesMatrixRow(self, self.rows - 1)
+
+
+
+    def append(self, rows, values):
+        """
+        Append a value to many series at once, dropping their oldest value when they are full.
+
+        :param rows: (numpy.ndarray) The rows of the series (distinct)
+        :param values: (numpy.ndarray) The values to append, one per row
+        :return: (int) The number of rotated series
+        """
+        if self.capacity == 0 or len(rows) == 0:
+            return 0
+
+        positions = (self.start[rows] + self.length[rows]) % self.capacity
+        full = self.length[rows] == self.capacity
+
+        self.data[rows, positions] = values
+        self.start[rows[full]] = (self.start[rows[full]] + 1) % self.capacity
+        self.length[rows[~full]] += 1
+
+        return int(full.sum())
+
+
+
+    def averages(self, rows):
+        """
+        Compute the averages of many series at once.
+
+        :param rows: (numpy.ndarray) The rows of the series
+        :return: (numpy.ndarray) The averages (0 for empty series)
+        """
+        totals = self.numpy.nansum(self.data[rows], axis=1, dtype=self.numpy.float64)
+        return totals / self.numpy.maximum(self.length[rows], 1)
+
+
+
+class SeriesMatrixRow():
+    """
+    This class is used to access a series stored in a SeriesMatrix, like a SeriesBuffer.
+    """
+
+    __slots__ = ("matrix", "row")
+
+    def __init__(self, matrix, row):
+        """
+        Initialize the SeriesMatrixRow object.
+
+        :param matrix: (SeriesMatrix) The matrix storing the series
+        :param row: (int) The row of the series
+        """
+        self.matrix = matrix
+        self.row = row
+
+
+
+    def __len__(self):
+        """
+        Give the number of values of the series.
+
+        :return: (int) The number of values
+        """
+        return int(self.matrix.length[self.row])
+
+
+
+    @property
+    def total(self):
+        """
+        Give the sum of values of the series.
+
+        :return: (float) The sum of values
+        """
+        return float(self.matrix.numpy.nansum(self.matrix.data[self.row], dtype=self.matrix.numpy.float64))
+
+
+
+    def append(self, value):
+        """
+        Append a value to the series, dropping the oldest value when the series is full.
+
+        :param value: (float) The value to append
+        :return: (float) The dropped value (None if the series was not full)
+        """
+        matrix = self.matrix
+        if matrix.capacity == 0:
+            return None
+
+        dropped = None
+        index = (matrix.start[self.row] + matrix.length[self.row]) % matrix.capacity
+
+        if matrix.length[self.row] == matrix.capacity:
+            dropped = float(matrix.data[self.row, index])
+            matrix.start[self.row] = (matrix.start[self.row] + 1) % matrix.capacity
+        else:
+            matrix.length[self.row] += 1
+
+        matrix.data[self.row, index] = value
+        return dropped
+
+
+
+    def merge_before(self, values):
+        """
+        Merge older values before the values of the series (only the most recent values are kept).
+
+        :param values: (list) The older values
+        """
+        merged = list(values) + self.values()
+        merged = merged[max(len(merged) - self.matrix.capacity, 0):]
+
+        self.matrix.data[self.row] = self.matrix.numpy.nan
+        self.matrix.data[self.row, :len(merged)] = merged
+        self.matrix.start[self.row] = 0
+        self.matrix.length[self.row] = len(merged)
+
+
+
+    def chronological(self):
+        """
+        Give the values of the series, from the oldest to the most recent one.
+
+        :return: (numpy.ndarray) The float32 values
+        """
+        start = int(self.matrix.start[self.row])
+        return self.matrix.numpy.roll(self.matrix.data[self.row], -start)[:len(self)]
+
+
+
+    def values(self):
+        """
+        Give the values of the series, from the oldest to the most recent one.
+
+        :return: (list) The values
+        """
+        return self.chronological().tolist()
+
+
+
+    def average(self):
+        """
+        Give the average of the series.
+
+        :return: (float) The average (0 for an empty series)
+        """
+        return float(self.matrix.averages([self.row])[0])
+
+
+
+    def pack(self):
+        """
+        Pack the series to store it in a BLOB column (see pack_series).
+
+        :return: (bytes) The packed series
+        """
+        return self.chronological().astype("<f4").tobytes()
+
+
+
+class InstanceSeries():
+    """
+    This class is used to store the monitoring data of an instance.
+    """
+
+    __slots__ = ("vcores", "vram", "series")
+
+    def __init__(self, capacities, vcores=0, vram=0, matrices=None):
+        """
+        Initialize the InstanceSeries object.
+
+        :param capacities: (dict) The number of values of each period series (e.g. {"hourly": 12, ...})
+        :param vcores: (int) The number of virtual cores of the instance
+        :param vram: (int) The virtual memory of the instance
+        :param matrices: (dict) The SeriesMatrix storing each (period, metric) series (None for ring buffers)
+        """
+        self.vcores = vcores
+        self.vram = vram
+        self.series = dict()
+        for (period, capacity) in capacities.items():
+            for metric in ["vcpu", "cpu", "mem"]:
+                if matrices is None:
+                    self.series[(period, metric)] = SeriesBuffer(capacity)
+                else:
+                    self.series[(period, metric)] = matrices[(period, metric)].add_row()
+
+
+
+    def get(self, period, metric):
+        """
+        Give a series of the instance.
+
+        :param period: (str) The series period (hourly, daily or weekly)
+        :param metric: (str) The series metric (vcpu, cpu or mem)
+        :return: (SeriesBuffer) The series
+        """
+        return self.series[(period, metric)]